@@ -0,0 +1,98 @@
+from array import array
+from bisect import bisect_left
+import fcntl
+import hashlib
+import heapq
+import os
+import re
+from .constants import STATE_DIR
+
+_V6_FLAG = 1 << 63
+
+
+def entry_key(version, network, prefix):
+    """
+    정규화된 항목 하나를 64비트 정수 키로. IPv4는 (network << 8 | prefix) 그대로,
+    IPv6는 blake2b 8바이트 해시(최상위 비트 set)라 IPv4 키와 겹치지 않는다.
+    """
+    if version == 4:
+        return network << 8 | prefix
+    digest = hashlib.blake2b(f"{network}/{prefix}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") | _V6_FLAG
+
+
+class AppliedIndex(object):
+    """
+    장비(trusguardip:port + 계정)별로 이미 반영한 블랙리스트 항목의 정렬된 키 배열.
+    STATE_DIR 아래 파일에 array('Q') 그대로 저장하며, 갱신은 flock으로 프로세스 간 직렬화한다.
+    """
+
+    def __init__(self, device, account):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{device}_{account}")
+        self.path = os.path.join(STATE_DIR, f"applied_{name}.idx")
+        self._keys = None
+
+    def _read(self):
+        keys = array("Q")
+        try:
+            with open(self.path, "rb") as f:
+                keys.frombytes(f.read())
+        except FileNotFoundError:
+            pass
+        return keys
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = self._read()
+        return self._keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        keys = self.keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def count_new(self, entries):
+        return sum(1 for entry in entries if entry_key(*entry) not in self)
+
+    def filter_new(self, entries, new_keys):
+        """
+        아직 반영되지 않은 항목만 통과시키고, 그 키를 new_keys(array)에 모은다.
+        """
+        for entry in entries:
+            key = entry_key(*entry)
+            if key not in self:
+                new_keys.append(key)
+                yield entry
+
+    def add(self, new_keys):
+        if not new_keys:
+            return len(self)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # 다른 실행이 그 사이에 추가했을 수 있으므로 디스크에서 다시 읽어 병합
+            merged = array("Q")
+            prev = None
+            for key in heapq.merge(self._read(), sorted(new_keys)):
+                if key != prev:
+                    merged.append(key)
+                    prev = key
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                merged.tofile(f)
+            os.replace(tmp_path, self.path)
+        self._keys = merged
+        return len(merged)
+
+    def reset(self):
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self._keys = None
@@ -0,0 +1,307 @@
+from connectors.core.connector import get_logger, ConnectorError
+from connectors.cyops_utilities.builtins import download_file_from_cyops
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from .constants import LOGGER_NAME, STATE_DIR, DEFAULT_ARTIFACT_CACHE_MB
+from .utils import to_int, to_bool
+
+logger = get_logger(LOGGER_NAME)
+
+TMP_DIR = tempfile.gettempdir()
+CACHE_DIR = os.path.join(STATE_DIR, "artifacts")
+_READ_CHUNK = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+class ArtifactCache(object):
+    """
+    FortiSOAR 첨부파일 디스크 캐시: file IRI -> sha256 -> 내용 사본 (+ 선택적으로 파싱 결과).
+    첨부파일 IRI의 내용은 바뀌지 않으므로 IRI가 같으면 다운로드하지 않는다.
+    전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은 내용부터 지운다 (LRU, 파일 mtime 기준).
+    여러 프로세스가 같은 디렉터리를 쓰므로 갱신은 flock으로 직렬화한다.
+    """
+
+    def __init__(self, max_bytes, store_parsed=True, root=CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.store_parsed_form = store_parsed
+        self.root = root
+        for name in ("iri", "blobs", "parsed"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+        # 이번 실행에서 넘겨준 작업 사본 경로 -> sha256
+        self._digests = {}
+        self._digests_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.parsed_hits = 0
+
+    def _iri_path(self, file_iri):
+        return os.path.join(self.root, "iri", hashlib.sha1(str(file_iri).encode()).hexdigest())
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest)
+
+    def _parsed_path(self, digest):
+        return os.path.join(self.root, "parsed", digest)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _remember(self, path, digest, counter=None):
+        with self._digests_lock:
+            self._digests[path] = digest
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+    def _digest_of(self, path):
+        with self._digests_lock:
+            return self._digests.get(path)
+
+    def fetch(self, file_iri, download, work_dir):
+        """
+        file_iri 내용의 작업 사본 경로를 반환 (호출한 쪽에서 지워도 캐시는 남는다).
+        캐시에 없으면 download(file_iri)로 받은 경로를 그대로 쓰고 내용을 캐시에 저장한다.
+        """
+        try:
+            with open(self._iri_path(file_iri)) as f:
+                digest = f.read().strip()
+        except OSError:
+            digest = None
+        if digest:
+            blob = self._blob_path(digest)
+            dst = os.path.join(work_dir, f"artifact_{digest[:16]}_{time.monotonic_ns()}_{threading.get_ident()}")
+            try:
+                _link_or_copy(blob, dst)
+            except OSError:
+                pass
+            else:
+                try:
+                    os.utime(blob)
+                except OSError:
+                    pass
+                self._remember(dst, digest, "hits")
+                logger.debug(f"Artifact cache hit for {file_iri} ({digest[:12]})")
+                return dst
+
+        with self._digests_lock:
+            self.misses += 1
+        path = download(file_iri)
+        try:
+            digest = file_digest(path)
+            with self._locked():
+                blob = self._blob_path(digest)
+                if not os.path.exists(blob):
+                    tmp = f"{blob}.{os.getpid()}.tmp"
+                    _link_or_copy(path, tmp)
+                    os.replace(tmp, blob)
+                else:
+                    os.utime(blob)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self._iri_path(file_iri)))
+                with os.fdopen(fd, "w") as f:
+                    f.write(digest)
+                os.replace(tmp, self._iri_path(file_iri))
+            self._remember(path, digest)
+            self.evict()
+        except OSError as err:
+            # 캐시는 최적화일 뿐이므로 실패해도 받은 파일은 그대로 쓴다
+            logger.warning(f"Failed to cache artifact {file_iri}: {err}")
+        return path
+
+    def parsed(self, path):
+        """
+        작업 사본의 파싱 결과 디렉터리 (없으면 None). Normalizer.load_parsed()로 불러온다.
+        """
+        digest = self._digest_of(path)
+        if not digest or not self.store_parsed_form:
+            return None
+        directory = self._parsed_path(digest)
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        try:
+            os.utime(self._blob_path(digest))
+        except OSError:
+            pass
+        with self._digests_lock:
+            self.parsed_hits += 1
+        return directory
+
+    def can_store_parsed(self, path):
+        return self.store_parsed_form and self._digest_of(path) is not None
+
+    def store_parsed(self, path, save):
+        """
+        save(directory)로 파싱 결과를 기록해 캐시에 넣고 그 디렉터리를 반환. 실패하면 None.
+        이미 있으면 (형식이 바뀌었거나 읽을 수 없어 다시 파싱한 경우) 새 결과로 바꾼다.
+        """
+        digest = self._digest_of(path)
+        final = self._parsed_path(digest)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(final), prefix=f"{digest}.")
+        try:
+            save(tmp)
+            with self._locked():
+                if os.path.exists(final):
+                    shutil.rmtree(final, ignore_errors=True)
+                os.rename(tmp, final)
+        except Exception as err:
+            shutil.rmtree(tmp, ignore_errors=True)
+            logger.warning(f"Failed to cache parsed artifact {digest[:12]}: {err}")
+            return None
+        self.evict()
+        return final
+
+    def evict(self):
+        """
+        내용(sha256) 단위로 원본 + 파싱 결과 크기를 합산해, max_bytes 이하가 될 때까지 오래된 것부터 삭제.
+        원본이 이미 지워진 파싱 결과도 따로 세어 지운다. 이번 실행에서 넘겨준 내용은 쓰는 중이므로
+        한도를 넘더라도 남겨 두고 다음 정리 때 지운다.
+        """
+        with self._digests_lock:
+            pinned = set(self._digests.values())
+        with self._locked():
+            sizes, mtimes = {}, {}
+            blobs_dir = os.path.join(self.root, "blobs")
+            for name in os.listdir(blobs_dir):
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    sizes[name] = _size(os.path.join(blobs_dir, name))
+                    mtimes[name] = os.path.getmtime(os.path.join(blobs_dir, name))
+                except OSError:
+                    sizes.pop(name, None)
+                    continue
+            for name in os.listdir(os.path.join(self.root, "parsed")):
+                # "<sha256>.xxxx"는 store_parsed()가 아직 쓰는 중인 임시 디렉터리
+                if "." in name:
+                    continue
+                parsed = self._parsed_path(name)
+                try:
+                    size, mtime = _size(parsed), os.path.getmtime(parsed)
+                except OSError:
+                    continue
+                sizes[name] = sizes.get(name, 0) + size
+                mtimes.setdefault(name, mtime)
+            total = sum(sizes.values())
+            for _, name in sorted((mtimes[name], name) for name in sizes):
+                if total <= self.max_bytes:
+                    break
+                if name in pinned:
+                    continue
+                size = sizes[name]
+                logger.debug(f"Evicting cached artifact {name[:12]} ({size} bytes)")
+                try:
+                    os.remove(self._blob_path(name))
+                except OSError:
+                    pass
+                shutil.rmtree(self._parsed_path(name), ignore_errors=True)
+                total -= size
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "parsed_hits": self.parsed_hits}
+
+
+def artifact_cache(params):
+    """
+    artifactcachemb/cacheparsed 파라미터로 ArtifactCache를 만든다. artifactcachemb가 0이면 None (캐시 안 씀).
+    """
+    max_mb = to_int(params.get("artifactcachemb"), DEFAULT_ARTIFACT_CACHE_MB, minimum=0)
+    if not max_mb:
+        return None
+    return ArtifactCache(max_mb * 1024 * 1024, to_bool(params.get("cacheparsed"), True))
+
+
+def parse_file_iris(value):
+    # 리스트, JSON 배열 문자열 또는 쉼표/공백으로 구분한 문자열
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                return [text]
+        else:
+            return [iri for iri in re.split(r"[,\s]+", text) if iri]
+    return [str(iri).strip() for iri in value or [] if str(iri).strip()]
+
+
+def _download(file_iri):
+    dw_file_md = download_file_from_cyops(file_iri)
+    return os.path.join(TMP_DIR, dw_file_md['cyops_file_path'])
+
+
+def fetch_artifact(file_iri, cache=None):
+    """
+    첨부파일을 내려받아 (cache가 있으면 캐시에서) 파일 경로만 반환 (row를 메모리에 올리지 않음).
+    """
+    try:
+        if cache is not None:
+            file_path = cache.fetch(file_iri, _download, TMP_DIR)
+        else:
+            file_path = _download(file_iri)
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(file_path)
+        return file_path
+    except Exception as err:
+        logger.error(f"Failed to download or read artifact file '{file_iri}': {err}")
+        raise ConnectorError(f"Failed to download or read artifact file '{file_iri}': {err}")
+
+
+def fetch_artifacts(file_iris, workers, cache=None):
+    """
+    workers개 스레드로 동시에 fetch_artifact. 결과 순서는 file_iris 순서를 따르고,
+    하나라도 실패하면 남은 다운로드를 취소하고 이미 받은 파일을 지운 뒤 예외를 올린다.
+    """
+    paths = [None] * len(file_iris)
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(file_iris)))
+    futures = {pool.submit(fetch_artifact, file_iri, cache): i for i, file_iri in enumerate(file_iris)}
+    try:
+        for future in as_completed(futures):
+            paths[futures[future]] = future.result()
+    except Exception:
+        pool.shutdown(wait=True, cancel_futures=True)
+        remove_files([f.result() for f in futures if f.done() and not f.cancelled() and f.exception() is None])
+        raise
+    pool.shutdown(wait=True)
+    return paths
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
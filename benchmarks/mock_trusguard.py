@@ -0,0 +1,262 @@
+"""
+TrusGuard REST API 로컬 대역 (벤치마크용 HTTPS mock 서버)
+
+구현: /token, /login, /logout, /policy/access_block/blacklist/bulk (POST/DELETE),
+      .../bulk/upload, .../bulk/search (page/limit 페이지 지원)
+요청마다 지연(latency)과 엔드포인트별 실패(failure injection)를 줄 수 있다.
+
+단독 실행:
+    python mock_trusguard.py --port 8443 --latency 0.02 --fail "DELETE /policy/access_block/blacklist/bulk=0.1"
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime
+import argparse
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+BULK_PATH = "/policy/access_block/blacklist/bulk"
+READ_CHUNK = 256 * 1024
+
+
+class MockState(object):
+    def __init__(self, latency=0.0, failures=None, fail_status=503, token_ttl=None):
+        self.latency = latency
+        # {"METHOD /path": 실패 확률}
+        self.failures = dict(failures or {})
+        self.fail_status = fail_status
+        self.token_ttl = token_ttl
+        self.tokens = {}
+        self.entries = []
+        self.next_index = 1
+        self.staged = {}
+        self.counts = {}
+        self.uploaded_bytes = 0
+        self.uploaded_rows = 0
+        self.lock = threading.Lock()
+
+    def add_entries(self, count, description, date_prefix=None):
+        date_prefix = date_prefix or datetime.now().strftime("%Y%m")
+        with self.lock:
+            for day in range(1, count + 1):
+                self._add_entry(f"blacklist_{date_prefix}{(day - 1) % 28 + 1:02d}.csv", description, 0)
+
+    def _add_entry(self, file_name, description, rows):
+        entry = {"index": self.next_index, "file_name": file_name, "description": description, "count": rows}
+        self.next_index += 1
+        self.entries.append(entry)
+        return entry
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts = {}
+            self.uploaded_bytes = 0
+            self.uploaded_rows = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": dict(self.counts),
+                "total_requests": sum(self.counts.values()),
+                "uploaded_bytes": self.uploaded_bytes,
+                "uploaded_rows": self.uploaded_rows,
+                "entries": len(self.entries),
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _iter_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                remaining = size
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, READ_CHUNK))
+                    remaining -= len(chunk)
+                    yield chunk
+                self.rfile.readline()
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining:
+            chunk = self.rfile.read(min(remaining, READ_CHUNK))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+    def _read_json(self):
+        raw = b"".join(self._iter_body())
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _authorized(self):
+        token = self.headers.get("Authorization")
+        expires = self.state.tokens.get(token)
+        return expires is not None and (expires == 0 or expires > time.monotonic())
+
+    def _dispatch(self, method):
+        state = self.state
+        path = urlparse(self.path).path
+        endpoint = f"{method} {path}"
+        with state.lock:
+            state.counts[endpoint] = state.counts.get(endpoint, 0) + 1
+        if state.latency:
+            time.sleep(state.latency)
+        if random.random() < state.failures.get(endpoint, 0):
+            for _ in self._iter_body():
+                pass
+            return self._reply(state.fail_status, {"error": "injected failure"})
+
+        if path == "/token" and method == "POST":
+            self._read_json()
+            token = uuid.uuid4().hex
+            with state.lock:
+                state.tokens[token] = time.monotonic() + state.token_ttl if state.token_ttl else 0
+            return self._reply(200, {"token": token})
+        if path in ("/login", "/logout") and method == "POST":
+            self._read_json()
+            if not self._authorized():
+                return self._reply(401, {"error": "invalid token"})
+            if path == "/logout":
+                with state.lock:
+                    state.tokens.pop(self.headers.get("Authorization"), None)
+            return self._reply(200, {"result": "success"})
+
+        if not self._authorized():
+            for _ in self._iter_body():
+                pass
+            return self._reply(401, {"error": "invalid token"})
+        token = self.headers.get("Authorization")
+
+        if path == BULK_PATH + "/upload" and method == "POST":
+            size = rows = 0
+            for chunk in self._iter_body():
+                size += len(chunk)
+                rows += chunk.count(b"\n")
+            with state.lock:
+                state.staged[token] = rows
+                state.uploaded_bytes += size
+                state.uploaded_rows += rows
+            return self._reply(200, {"result": "success", "size": size})
+        if path == BULK_PATH + "/search" and method == "GET":
+            query = parse_qs(urlparse(self.path).query)
+            with state.lock:
+                entries = list(state.entries)
+            if "page" in query and "limit" in query:
+                page, limit = int(query["page"][0]), int(query["limit"][0])
+                entries = entries[(page - 1) * limit:page * limit]
+            return self._reply(200, {"result": entries})
+        if path == BULK_PATH and method == "POST":
+            payload = self._read_json()
+            with state.lock:
+                rows = state.staged.pop(token, None)
+                if rows is None:
+                    return self._reply(400, {"error": "no uploaded file"})
+                entry = state._add_entry(f"blacklist_{datetime.now():%Y%m%d}.csv",
+                                         payload.get("description", ""), rows)
+            return self._reply(200, {"result": "success", "index": entry["index"]})
+        if path == BULK_PATH and method == "DELETE":
+            payload = self._read_json()
+            with state.lock:
+                before = len(state.entries)
+                state.entries = [e for e in state.entries if str(e["index"]) != str(payload.get("index"))]
+                found = len(state.entries) != before
+            return self._reply(200 if found else 404, {"result": "success" if found else "not found"})
+        self._reply(404, {"error": "not found"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class MockTrusGuard(object):
+    """
+    자체 서명 인증서로 HTTPS mock 서버를 백그라운드 스레드에서 띄운다. (openssl CLI 필요)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, **state_options):
+        self.state = MockState(**state_options)
+        self._cert_dir = tempfile.mkdtemp(prefix="mock_trusguard_")
+        cert, key = os.path.join(self._cert_dir, "cert.pem"), os.path.join(self._cert_dir, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key,
+                        "-out", cert, "-days", "1", "-subj", "/CN=localhost"],
+                       check=True, capture_output=True)
+        handler = type("BoundHandler", (Handler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+
+def parse_failures(values):
+    failures = {}
+    for value in values or []:
+        endpoint, _, rate = value.rpartition("=")
+        failures[endpoint.strip()] = float(rate)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--fail", action="append", metavar="'METHOD /path=RATE'", help="failure injection")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+    mock = MockTrusGuard(args.host, args.port, latency=args.latency,
+                         failures=parse_failures(args.fail), fail_status=args.fail_status).start()
+    print(f"Mock TrusGuard listening on https://{mock.host}:{mock.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+오프라인 벤치마크: 로컬 TrusGuard mock(HTTPS)을 띄우고 upload / delete_merge를 합성 CSV로 실행해
+시나리오별 wall time, peak RSS, 요청 수를 보고한다. FortiSOAR 없이 실행할 수 있도록
+download_file_from_cyops는 로컬 파일을 넘겨주는 stub으로 바꾼다.
+
+예:
+    python benchmarks/run_bench.py
+    python benchmarks/run_bench.py --sizes 10000,1000000,10000000 --merge 30x10000 --latency 0.02
+    python benchmarks/run_bench.py --param normalize=false --param pipeline=false --json result.json
+"""
+from mock_trusguard import MockTrusGuard, parse_failures
+import argparse
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "withconnector_ahnlab"
+
+
+def generate_csv(path, rows, seed, duplicate_ratio=0.1):
+    """
+    무작위 IPv4 블랙리스트 (일부 중복/CIDR 포함)
+    """
+    rnd = random.Random(seed)
+    recent = []
+    with open(path, "w") as f:
+        for _ in range(rows):
+            if recent and rnd.random() < duplicate_ratio:
+                f.write(rnd.choice(recent))
+                continue
+            line = f"{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}"
+            if rnd.random() < 0.01:
+                line += f"/{rnd.randrange(16, 32)}"
+            line += "\n"
+            if len(recent) < 1000:
+                recent.append(line)
+            f.write(line)
+    return path
+
+
+def install_stubs(files):
+    """
+    FortiSOAR 모듈 대역. connectors.core.connector는 설치돼 있지 않을 때만 대신한다.
+    download_file_from_cyops는 항상 file IRI -> 로컬 합성 파일 사본(하드링크)으로 대신한다.
+    """
+    try:
+        import connectors.core.connector  # noqa: F401
+    except ImportError:
+        core = types.ModuleType("connectors.core.connector")
+        core.get_logger = logging.getLogger
+        core.ConnectorError = type("ConnectorError", (Exception,), {})
+        core.Connector = object
+        for name in ("connectors", "connectors.core"):
+            sys.modules.setdefault(name, types.ModuleType(name))
+        sys.modules["connectors.core.connector"] = core
+
+    download_dir = tempfile.mkdtemp(prefix="bench_dl_")
+
+    def download_file_from_cyops(file_iri):
+        src = files[file_iri]
+        dst = os.path.join(download_dir, f"{os.path.basename(src)}.{time.monotonic_ns()}")
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+        # 절대 경로라 커넥터가 TMP 경로와 join해도 그대로 유지된다
+        return {"cyops_file_path": dst}
+
+    builtins = types.ModuleType("connectors.cyops_utilities.builtins")
+    builtins.download_file_from_cyops = download_file_from_cyops
+    sys.modules.setdefault("connectors.cyops_utilities", types.ModuleType("connectors.cyops_utilities"))
+    sys.modules["connectors.cyops_utilities.builtins"] = builtins
+
+
+def load_connector():
+    spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [REPO_DIR]
+    sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.builtins").supported_operations
+
+
+def _run_scenario(queue, operation, config, params, files):
+    # fork된 자식 프로세스에서 실행: 시나리오마다 RSS/전역 상태(세션 풀 등)가 분리된다
+    install_stubs(files)
+    operations = load_connector()
+    started = time.monotonic()
+    try:
+        result = operations[operation](config, params)
+    except Exception as err:
+        result = {"success": False, "error": repr(err)}
+    wall = time.monotonic() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "success": result.get("success"),
+        "error": result.get("error"),
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "metrics": result.get("metrics"),
+    })
+
+
+def run_scenario(mock, name, operation, params, files, extra_params):
+    config = {"trusguardip": mock.host, "trusguardport": mock.port,
+              "trusguardid": "bench", "trusguardpassword": "bench"}
+    params = dict(params, loginattempt="1", **extra_params)
+    mock.state.reset_counts()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_run_scenario, args=(queue, operation, config, params, files))
+    process.start()
+    result = queue.get()
+    process.join()
+    result.update(name=name, operation=operation, server=mock.state.snapshot())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="upload scenario row counts (comma separated)")
+    parser.add_argument("--merge", action="append", metavar="FILESxROWS",
+                        help="delete_merge scenario, e.g. 30x10000 (default: 30x10000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock latency per request (seconds)")
+    parser.add_argument("--fail", action="append", metavar="'METHOD /path=RATE'", help="mock failure injection")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra operation parameter (e.g. normalize=false)")
+    parser.add_argument("--workdir", help="where synthetic CSVs are written (default: temp dir)")
+    parser.add_argument("--json", help="write the full results to this file")
+    args = parser.parse_args()
+
+    extra_params = dict(p.split("=", 1) for p in args.param)
+    # 커넥터의 STATE_DIR(아티팩트 캐시, 진행 기록, 증분 인덱스)와 임시 파일을 실행마다 새 디렉터리에 둔다.
+    # 자식 프로세스가 커넥터를 import할 때 tempfile.gettempdir()로 정해지므로 fork 전에 바꾼다
+    state_dir = tempfile.mkdtemp(prefix="bench_state_")
+    os.environ["TMPDIR"] = state_dir
+    tempfile.tempdir = None
+    # file IRI는 실행/시나리오마다 다르게 (IRI -> 내용 캐시가 이전 시나리오의 파일을 돌려주지 않도록)
+    nonce = f"{os.getpid()}-{time.time_ns()}"
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_csv_")
+    os.makedirs(workdir, exist_ok=True)
+    logging.basicConfig(level=logging.WARNING)
+
+    mock = MockTrusGuard(latency=args.latency, failures=parse_failures(args.fail)).start()
+    results = []
+    try:
+        for rows in [int(s) for s in args.sizes.split(",") if s]:
+            path = generate_csv(os.path.join(workdir, f"upload_{rows}.csv"), rows, seed=rows)
+            iri = f"iri-upload-{rows}-{nonce}"
+            results.append(run_scenario(mock, f"upload {rows} rows", "upload",
+                                        {"fileiri": iri, "uploaddescription": "bench"},
+                                        {iri: path}, extra_params))
+        for spec in args.merge or ["30x10000"]:
+            count, rows = (int(x) for x in spec.lower().split("x"))
+            files = {f"iri-merge-{count}x{rows}-{i}-{nonce}": generate_csv(os.path.join(workdir, f"merge_{i}_{rows}.csv"), rows, seed=i)
+                     for i in range(count)}
+            mock.state.add_entries(count, "daily")
+            end_date = time.strftime("%Y%m28")
+            results.append(run_scenario(mock, f"delete_merge {count}x{rows} rows", "delete_merge",
+                                        {"fileiris": list(files), "enddate": end_date,
+                                         "mergedescription": "monthly", "deletedescription": "daily"},
+                                        files, extra_params))
+    finally:
+        mock.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print(f"{'scenario':<36} {'ok':<5} {'wall_s':>8} {'peak_rss_mb':>12} {'requests':>9} {'upload_mb':>10}")
+    for r in results:
+        server = r["server"]
+        print(f"{r['name']:<36} {str(r['success']):<5} {r['wall_seconds']:>8} {r['peak_rss_mb']:>12} "
+              f"{server['total_requests']:>9} {server['uploaded_bytes'] / 1048576:>10.1f}")
+        if not r["success"]:
+            print(f"    error: {r['error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from connectors.core.connector import get_logger, ConnectorError
+import random
+import threading
+import time
+from .constants import LOGGER_NAME, AUTH_BREAKER_THRESHOLD, AUTH_BREAKER_COOLDOWN
+
+logger = get_logger(LOGGER_NAME)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def alert(stage, last_result):
+    stage_repr = "Warning" if stage == 3 else "Retry" if stage < 5 else "Critical"
+    logger.error(f"[Auth Retry {stage_repr}] {stage} consecutive failures: {last_result}")
+
+
+def backoff_delay(attempt, base, ceiling):
+    """
+    지수 backoff (base * 2^(attempt-1), ceiling 상한)에 full jitter 적용
+    """
+    return random.uniform(0, min(ceiling, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker(object):
+    """
+    장비별 로그인 실패를 실행 간에 누적한다.
+    연속 실패가 threshold에 닿으면 open -> cooldown 동안 새 로그인 시도는 즉시 실패,
+    cooldown이 지나면 half_open으로 한 번만 시험 로그인을 허용하고 성공하면 closed로 돌아간다.
+    """
+
+    def __init__(self, device, threshold=AUTH_BREAKER_THRESHOLD, cooldown=AUTH_BREAKER_COOLDOWN):
+        self.device = device
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_attempt(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    raise ConnectorError(f"TrusGuard {self.device} login circuit is open after "
+                                         f"{self.failures} consecutive failures; retry in {int(remaining)}s")
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    raise ConnectorError(f"TrusGuard {self.device} login circuit is half-open; "
+                                         f"a trial login is already in progress")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, last_result):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            alert(self.failures, last_result)
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._transition(OPEN)
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() < self.opened_at + self.cooldown
+
+    def _transition(self, state):
+        previous, self.state = self.state, state
+        if state == OPEN:
+            logger.error(f"[Auth Circuit Critical] {self.device}: {previous} -> open, "
+                         f"failing fast for {self.cooldown}s")
+        elif state == HALF_OPEN:
+            logger.warning(f"[Auth Circuit Retry] {self.device}: open -> half_open, allowing one trial login")
+        else:
+            logger.info(f"[Auth Circuit Recovered] {self.device}: {previous} -> closed")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(device):
+    with _breakers_lock:
+        breaker = _breakers.get(device)
+        if breaker is None:
+            breaker = _breakers[device] = CircuitBreaker(device)
+        return breaker
@@ -1,5 +1,6 @@
 #FSR Autogenerated Content. DO NOT DELETE
 from .upload import upload
 from .delete_merge import delete_merge
+from .upload_batch import upload_batch
  
-supported_operations = {'upload': upload, 'delete_merge': delete_merge, }
\ No newline at end of file
+supported_operations = {'upload': upload, 'delete_merge': delete_merge, 'upload_batch': upload_batch, }
\ No newline at end of file
@@ -0,0 +1,259 @@
+from connectors.core.connector import get_logger
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import itertools
+import os
+import tempfile
+import threading
+import time
+from .client import get_client, device_governor, StagedUpload
+from .constants import LOGGER_NAME, CHUNK_RETRY_BACKOFF_SECONDS, UPLOAD_FILE_NAME, DEFAULT_SEARCH_PAGE_SIZE
+from .multipart import multipart_body
+from .normalize import is_header
+from .responses import decode_response
+from .search import search_entries
+from .utils import to_int
+
+logger = get_logger(LOGGER_NAME)
+
+UPLOAD_PATH = "/policy/access_block/blacklist/bulk/upload"
+BULK_PATH = "/policy/access_block/blacklist/bulk"
+
+
+def spool_chunks(rows, max_rows=0, max_bytes=0):
+    """
+    row를 max_rows개 또는 max_bytes바이트 단위의 CSV 임시 파일로 나눠 경로를 차례로 반환.
+    첫 row가 헤더면 모든 조각 앞에 붙인다. 실패한 조각만 다시 보낼 수 있도록
+    조각은 파일로 남기며, 지우는 것은 호출한 쪽에서 한다.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def encode(row):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(row)
+        return buf.getvalue().encode("utf-8")
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = None
+    if is_header(first):
+        header = encode(first)
+    else:
+        rows = itertools.chain([first], rows)
+
+    f = None
+    try:
+        for row in rows:
+            if f is None:
+                fd, path = tempfile.mkstemp(prefix="trusguard_chunk_", suffix=".csv")
+                f = os.fdopen(fd, "wb")
+                count = size = 0
+                if header is not None:
+                    f.write(header)
+                    size += len(header)
+            line = encode(row)
+            f.write(line)
+            count += 1
+            size += len(line)
+            if (max_rows and count >= max_rows) or (max_bytes and size >= max_bytes):
+                f.close()
+                f = None
+                yield path
+        if f is not None:
+            f.close()
+            f = None
+            yield path
+    finally:
+        # 중간에 실패하면 아직 넘기지 않은 조각 파일을 지운다
+        if f is not None:
+            f.close()
+            os.remove(path)
+
+
+class ChunkedUpload(object):
+    """
+    블랙리스트를 조각으로 나눠 조각마다 upload -> bulk 로 반영한다.
+    workers개의 lane이 각자 세션/토큰(get_client(config, lane))을 써서 동시에 보내고,
+    실패한 조각만 retries번까지 다시 보낸다. bulk 요청 중에 예외가 난 조각은 장비에 반영됐을 수 있으므로
+    검색한 항목 수로 반영 여부를 확인한 뒤에만 다시 보내고, 확인하지 못하면 unverified로 남긴다. 첫 lane은 작업이 governor에서 받은 lane 그대로,
+    나머지는 governor에서 빈 자리를 더 받아 쓰고 (장비 동시 세션 수에 포함), 자리가 모자라면
+    받은 만큼만 동시에 보낸다.
+    """
+
+    def __init__(self, config, metrics, description, workers=1, retries=2, login_attempt=None, max_delay=None,
+                 lane=0, file_name=UPLOAD_FILE_NAME):
+        self.config = config
+        self.metrics = metrics
+        self.description = description
+        self.workers = workers
+        self.retries = retries
+        self.login_attempt = login_attempt
+        self.max_delay = max_delay
+        self._local = threading.local()
+        self.lane = lane
+        self.file_name = file_name
+        self._lanes = [lane]
+        self._next_lane = 0
+        self._lanes_lock = threading.Lock()
+        self.search_page_size = to_int(config.get("searchpagesize"), DEFAULT_SEARCH_PAGE_SIZE, minimum=0)
+
+    def _lane_client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            with self._lanes_lock:
+                lane = self._lanes[self._next_lane]
+                self._next_lane += 1
+            client = self.metrics.instrument(get_client(self.config, lane))
+            self._local.client = client
+        client.authenticate(self.login_attempt, self.max_delay)
+        return client
+
+    def _count_entries(self):
+        """
+        description이 같은 bulk 항목 수. 검색이 실패하면 None.
+        작업 스레드가 보내고 있지 않을 때만 부른다 (첫 lane의 세션을 같이 쓴다).
+        """
+        try:
+            client = self.metrics.instrument(get_client(self.config, self.lane))
+            client.authenticate(self.login_attempt, self.max_delay)
+            index = search_entries(client, self.search_page_size, ttl=0)
+        except Exception as err:
+            logger.error(f"Search for chunk verification failed: {err}")
+            return None
+        if not index.complete:
+            return None
+        return sum(1 for item in index.entries if item.get("description") == self.description)
+
+    def _send(self, number, path):
+        """
+        조각 하나를 업로드하고 bulk로 반영. 성공하면 None, 실패하면 실패 정보 dict.
+        업로드가 끝난 뒤 bulk 요청에서 예외가 나면 stage는 "bulk_exception" (반영됐는지 모름).
+        """
+        uploaded = False
+        try:
+            client = self._lane_client()
+
+            def upload():
+                body, content_type = multipart_body("blacklist_csv", self.file_name, path)
+                self.metrics.add("upload", nbytes=len(body))
+                try:
+                    resp = client.request("POST", UPLOAD_PATH, data=body,
+                                          headers={"key": "Authorization", "Content-Type": content_type})
+                finally:
+                    body.close()
+                return resp.status_code == 200, resp
+
+            staged = StagedUpload(client, upload, self.login_attempt, self.max_delay)
+            ok, resp = staged.upload()
+            if not ok:
+                return {"chunk": number, "stage": "upload", "status_code": resp.status_code,
+                        "response": decode_response(resp)}
+            uploaded = True
+            payload = {"description": self.description, "expire_enable": "0"}
+            resp = staged.bulk(lambda token: client.request("POST", BULK_PATH, json=payload, token=token,
+                                                            headers={"Content-Type": "application/json"}))
+            if resp.status_code != 200:
+                return {"chunk": number, "stage": "bulk", "status_code": resp.status_code,
+                        "response": decode_response(resp)}
+            return None
+        except Exception as err:
+            return {"chunk": number, "stage": "bulk_exception" if uploaded else "exception", "status_code": None,
+                    "response": str(err)}
+
+    def _send_recorded(self, number, path, on_commit):
+        failure = self._send(number, path)
+        if failure is None and on_commit is not None:
+            on_commit(number)
+        return failure
+
+    def run(self, rows, max_rows=0, max_bytes=0, skip=(), on_commit=None):
+        """
+        rows를 조각으로 나눠 보내고 {chunks, committed, failed, retried, skipped} 요약을 반환.
+        재시도 후에도 실패한 조각이 있으면 failed에 남는다 (나머지 조각은 이미 반영된 상태).
+        같은 rows/조각 크기면 조각 번호가 같으므로, 이전 실행에서 반영된 번호를 skip으로 주면 다시 보내지 않는다.
+        on_commit(number)은 조각이 반영될 때마다 (작업 스레드에서) 호출된다.
+        """
+        paths = {}
+        retried = set()
+        skip = set(skip)
+        # bulk 도중 예외가 난 조각을 확인할 기준 항목 수 (다시 보내지 않으면 확인할 일도 없다)
+        baseline = self._count_entries() if self.retries else None
+
+        def settle(failed):
+            # 반영 여부를 모르는 조각: 늘어난 항목 수가 그 조각 수와 같으면 반영, 0이면 미반영(다시 보냄),
+            # 그 외이거나 검색이 실패하면 unverified로 남기고 다시 보내지 않는다
+            nonlocal baseline
+            unsure = [n for n, f in failed.items() if f["stage"] == "bulk_exception" and "verified" not in f]
+            if not unsure:
+                return
+            count = self._count_entries() if baseline is not None else None
+            applied = None if count is None else count - baseline - len(set(paths) - set(failed) - skip)
+            if applied == len(unsure):
+                logger.info(f"Chunk(s) {unsure} were applied before the error; not resending")
+                for n in unsure:
+                    del failed[n]
+                    if on_commit is not None:
+                        on_commit(n)
+            elif applied != 0:
+                logger.warning(f"Cannot verify whether chunk(s) {unsure} were applied; not resending")
+                for n in unsure:
+                    failed[n]["verified"] = "unverified"
+                # unverified 조각이 반영됐는지 모르므로 이후 항목 수는 기준으로 쓸 수 없다
+                baseline = None
+
+        governor = device_governor(self.config)
+        extra = []
+        for _ in range(self.workers - 1):
+            slot = governor.try_acquire()
+            if slot is None:
+                break
+            extra.append(slot)
+        if len(extra) < self.workers - 1:
+            logger.info(f"Only {len(extra) + 1} of {self.workers} chunk workers got a session on "
+                        f"{governor.device}")
+        self._lanes, self._next_lane = [self.lane] + extra, 0
+        try:
+            with ThreadPoolExecutor(max_workers=len(self._lanes)) as pool:
+                # 조각을 만드는 대로 바로 전송 (파일 분할과 업로드를 겹친다)
+                futures = {}
+                for number, path in enumerate(spool_chunks(rows, max_rows, max_bytes), 1):
+                    paths[number] = path
+                    if number not in skip:
+                        futures[number] = pool.submit(self._send_recorded, number, path, on_commit)
+                failed = {n: f.result() for n, f in futures.items() if f.result() is not None}
+
+                for attempt in range(1, self.retries + 1):
+                    settle(failed)
+                    resend = sorted(n for n, f in failed.items() if "verified" not in f)
+                    if not resend:
+                        break
+                    logger.warning(f"Retrying {len(resend)} failed chunk(s): {resend}")
+                    time.sleep(CHUNK_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+                    retried.update(resend)
+                    futures = {n: pool.submit(self._send_recorded, n, paths[n], on_commit) for n in resend}
+                    for n, f in futures.items():
+                        if f.result() is None:
+                            del failed[n]
+                        else:
+                            failed[n] = f.result()
+                settle(failed)
+        finally:
+            for slot in extra:
+                governor.release(slot)
+            for path in paths.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return {
+            "chunks": len(paths),
+            "committed": sorted(set(paths) - set(failed) - skip),
+            "failed": [failed[n] for n in sorted(failed)],
+            "retried": sorted(retried),
+            "skipped": sorted(skip & set(paths)),
+        }
@@ -0,0 +1,308 @@
+from connectors.core.connector import get_logger, ConnectorError
+from requests.adapters import HTTPAdapter
+import requests
+import threading
+import time
+import urllib3
+from .breaker import get_breaker, backoff_delay
+from .constants import (LOGGER_NAME, DEFAULT_TIMEOUT, VERIFY_SSL, DEFAULT_LOGIN_ATTEMPT,
+                        AUTH_BACKOFF_BASE, AUTH_BACKOFF_CEILING, TOKEN_TTL_SECONDS, TOKEN_REFRESH_MARGIN_SECONDS,
+                        POOL_MAXSIZE,
+                        DEFAULT_MAX_SESSIONS, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_REQUEST_BURST)
+from .governor import get_governor
+from .utils import to_int
+
+logger = get_logger(LOGGER_NAME)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def parse_login_attempt(value):
+    # 기본값 5, 숫자가 아니거나 None일 경우 fallback
+    return to_int(value, DEFAULT_LOGIN_ATTEMPT)
+
+
+def _json_or_none(resp):
+    if not resp.headers.get('content-type', '').startswith('application/json'):
+        return None
+    try:
+        return resp.json()
+    except ValueError:
+        return None
+
+
+def _rewind(kwargs):
+    # 재전송 전에 파일 body를 처음으로 되돌린다
+    bodies = [kwargs.get("data")]
+    for value in (kwargs.get("files") or {}).values():
+        bodies.append(value[1] if isinstance(value, tuple) else value)
+    for body in bodies:
+        if hasattr(body, "seek"):
+            body.seek(0)
+
+
+class TrusGuardClient(object):
+    """
+    TrusGuard 장비 하나에 대한 keep-alive 세션 + 로그인 토큰 캐시.
+    프로세스 안에서 get_client()로 공유되며, 토큰은 만료되거나 장비가 거부(401/403)할 때만 재발급한다.
+    """
+
+    def __init__(self, host, port, username, password, timeout=DEFAULT_TIMEOUT, verify_ssl=VERIFY_SSL):
+        self.device = f"{host}:{port}"
+        self.base_url = f"https://{host}:{port}"
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE))
+        self.login_detail = None
+        self.breaker = get_breaker(self.device)
+        # 같은 장비의 모든 세션/lane이 초당 요청 수 제한을 함께 쓴다
+        self.governor = get_governor(self.device)
+        self._token = None
+        self._token_expiry = 0
+        self._auth_lock = threading.Lock()
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    @property
+    def token(self):
+        with self._auth_lock:
+            return self._token
+
+    def authenticate(self, login_attempt=None, max_delay=None, timeout=None, min_ttl=0):
+        """
+        캐시된 토큰이 유효하면 그대로 반환, 아니면 /token -> /login 순으로 새로 로그인.
+        max_delay는 재시도 간 backoff 상한(초), timeout은 로그인 요청 하나의 제한 시간(초).
+        min_ttl초보다 적게 남은 토큰은 미리 새로 받는다.
+        """
+        with self._auth_lock:
+            if self._token and time.monotonic() + min_ttl < self._token_expiry:
+                return self._token, self.login_detail
+            token, login_json = self._login(parse_login_attempt(login_attempt),
+                                            to_int(max_delay, AUTH_BACKOFF_CEILING, minimum=0),
+                                            timeout or self.timeout)
+            self._token = token
+            self._token_expiry = time.monotonic() + TOKEN_TTL_SECONDS
+            self.login_detail = login_json
+            return token, login_json
+
+    def _login(self, max_attempt, max_delay, timeout):
+        token_url = self.url("/token")
+        login_url = self.url("/login")
+        payload = {"id": self.username, "password": self.password}
+        last_result = None
+
+        for attempt in range(1, max_attempt + 1):
+            # circuit이 열려 있으면 여기서 바로 ConnectorError
+            self.breaker.before_attempt()
+            try:
+                self.governor.throttle()
+                resp = self.session.post(token_url, json=payload, verify=self.verify_ssl, timeout=timeout)
+                token_json = _json_or_none(resp)
+                token = token_json.get("token") if resp.status_code == 200 and token_json else None
+            except Exception as e:
+                token = None
+                token_json = {"error": str(e)}
+                resp = None
+
+            if token:
+                headers = {"key": "Authorization", "Authorization": token}
+                try:
+                    self.governor.throttle()
+                    resp2 = self.session.post(login_url, headers=headers, verify=self.verify_ssl,
+                                              timeout=timeout)
+                    login_json = _json_or_none(resp2)
+                    if resp2.status_code == 200:
+                        self.breaker.record_success()
+                        return token, login_json
+                    last_result = {
+                        "stage": "login",
+                        "attempt": attempt,
+                        "resp_json": login_json,
+                        "code": resp2.status_code
+                    }
+                except Exception as e:
+                    last_result = {
+                        "stage": "login_exception",
+                        "attempt": attempt,
+                        "error": str(e)
+                    }
+            else:
+                last_result = {
+                    "stage": "get_token",
+                    "attempt": attempt,
+                    "resp_json": token_json,
+                    "code": getattr(resp, "status_code", None)
+                }
+            self.breaker.record_failure(last_result)
+            if attempt < max_attempt:
+                if self.breaker.is_open:
+                    break
+                time.sleep(backoff_delay(attempt, AUTH_BACKOFF_BASE, max_delay))
+        raise ConnectorError(f"Login failed after {attempt} attempts, {last_result}")
+
+    def invalidate(self, token=None):
+        with self._auth_lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._token_expiry = 0
+
+    def request(self, method, path, headers=None, timeout=None, token=None, **kwargs):
+        """
+        인증 헤더를 붙여 요청. 장비가 토큰을 거부하면 한 번 재로그인 후 재전송한다.
+        파일/multipart body는 seek(0)으로 되감아 다시 보낸다.
+        token을 주면 그 토큰으로만 보내고 재로그인하지 않는다 (401/403도 그대로 반환).
+        """
+        if token is not None:
+            return self._send(method, path, token, headers, timeout, **kwargs)
+        token, _ = self.authenticate()
+        resp = self._send(method, path, token, headers, timeout, **kwargs)
+        if resp.status_code in (401, 403):
+            logger.info(f"Token rejected by {self.device} ({resp.status_code}), re-authenticating")
+            self.invalidate(token)
+            token, _ = self.authenticate(login_attempt=1)
+            _rewind(kwargs)
+            resp = self._send(method, path, token, headers, timeout, **kwargs)
+        return resp
+
+    def _send(self, method, path, token, headers, timeout, **kwargs):
+        send_headers = dict(headers or {})
+        send_headers["Authorization"] = token
+        self.governor.throttle()
+        # verify는 요청마다 넘긴다 (Session.verify는 REQUESTS_CA_BUNDLE 환경변수에 덮어씌워짐)
+        return self.session.request(method, self.url(path), headers=send_headers, verify=self.verify_ssl,
+                                    timeout=timeout or self.timeout, **kwargs)
+
+    def logout(self):
+        with self._auth_lock:
+            token, self._token, self._token_expiry = self._token, None, 0
+        if not token:
+            return None
+        try:
+            self.governor.throttle()
+            response = self.session.post(self.url("/logout"), headers={"Authorization": token},
+                                         verify=self.verify_ssl, timeout=5)
+            if response.status_code == 200:
+                payload = _json_or_none(response)
+                result = {"response_code": response.status_code,
+                          "response": payload if payload is not None else response.text}
+            else:
+                result = {"response_code": response.status_code, "response": response.text}
+        except requests.exceptions.RequestException as e:
+            result = {"response_code": None, "response": str(e)}
+        return result
+
+    def close(self):
+        result = self.logout()
+        self.session.close()
+        return result
+
+
+class StagedUpload(object):
+    """
+    업로드 -> (삭제 등) -> bulk를 한 세션(토큰)으로 묶는다. 장비는 올린 파일을 세션별로 들고 있으므로
+    그 사이 재로그인하면 bulk가 'no uploaded file'로 실패한다 (삭제까지 끝난 뒤라면 항목이 모두 사라진다).
+    upload()는 (성공 여부, 상세)를 반환하고 다시 불러도 같은 파일을 올려야 한다.
+    """
+
+    def __init__(self, client, upload, login_attempt=None, max_delay=None):
+        self.client = client
+        self._upload = upload
+        self.login_attempt = login_attempt
+        self.max_delay = max_delay
+        self.token = None
+        self.reuploads = 0
+
+    def upload(self):
+        # 남은 시간이 짧은 토큰(이전 실행의 로그인일 수 있다)은 업로드 전에 새로 받는다
+        self.client.authenticate(self.login_attempt, self.max_delay, min_ttl=TOKEN_REFRESH_MARGIN_SECONDS)
+        ok, detail = self._upload()
+        # 업로드 중 재로그인했다면 재전송에 쓴 새 토큰
+        self.token = self.client.token
+        return ok, detail
+
+    def bulk(self, send):
+        """
+        send(token)으로 업로드한 세션의 토큰으로만 bulk를 보내고 응답을 반환.
+        토큰이 바뀌었거나 장비가 거부(401/403)하면 새 세션에 다시 업로드한 뒤 한 번 더 보낸다.
+        """
+        for attempt in range(2):
+            if self.client.token != self.token:
+                logger.warning(f"Session on {self.client.device} changed after the upload; uploading again "
+                               f"before bulk")
+                ok, detail = self.upload()
+                if not ok:
+                    raise ConnectorError(f"File upload failed after session change: {detail}")
+                self.reuploads += 1
+            resp = send(self.token)
+            if resp.status_code not in (401, 403) or attempt:
+                return resp
+            logger.info(f"Token rejected by {self.client.device} on bulk ({resp.status_code}), re-authenticating")
+            self.client.invalidate(self.token)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client_key(config):
+    return f"{config.get('trusguardip')}:{config.get('trusguardport')}", config.get("trusguardid")
+
+
+def device_name(config):
+    return _client_key(config)[0]
+
+
+def get_client(config, lane=0):
+    """
+    trusguardip:trusguardport + 계정 단위로 프로세스 전체에서 공유하는 클라이언트 반환.
+    lane은 같은 장비에 별도 세션/토큰이 필요할 때(분할 업로드 병렬 전송) 쓰는 번호.
+    """
+    key = _client_key(config) + (lane,)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None and client.password != config.get("trusguardpassword"):
+            _clients.pop(key)
+            client.session.close()
+            client = None
+        if client is None:
+            client = TrusGuardClient(config.get("trusguardip"), config.get("trusguardport"),
+                                     config.get("trusguardid"), config.get("trusguardpassword"))
+            _clients[key] = client
+        return client
+
+
+def device_governor(config):
+    """
+    장비의 세션/요청 수 제한(governor)을 connector config 값으로 맞춰 반환.
+    작업은 acquire()로 받은 자리 번호를 get_client(config, lane)에 넘기고 끝나면 release()한다.
+    """
+    governor = get_governor(device_name(config))
+    governor.configure(to_int(config.get("maxsessions"), DEFAULT_MAX_SESSIONS),
+                       to_int(config.get("requestspersecond"), DEFAULT_REQUESTS_PER_SECOND, minimum=0),
+                       to_int(config.get("requestburst"), DEFAULT_REQUEST_BURST))
+    return governor
+
+
+def close_client(config):
+    prefix = _client_key(config)
+    with _clients_lock:
+        clients = [_clients.pop(key) for key in list(_clients) if key[:2] == prefix]
+    for client in clients:
+        try:
+            client.close()
+        except Exception as err:
+            logger.warning(f"Failed to close TrusGuard session for {client.device}: {err}")
+
+
+def close_all_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as err:
+            logger.warning(f"Failed to close TrusGuard session for {client.device}: {err}")
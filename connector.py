@@ -2,7 +2,9 @@ from connectors.core.connector import Connector
 from connectors.core.connector import get_logger, ConnectorError
 from django.utils.module_loading import import_string
 from .builtins import *
+from .client import close_client, close_all_clients
 from .constants import LOGGER_NAME
+from .health import check_health, invalidate as invalidate_health
 logger = get_logger(LOGGER_NAME)
 
 
@@ -12,4 +14,18 @@ class Withconnector_ahnlab(Connector):
         return supported_operations.get(operation)(config, params)
 
     def check_health(self, config=None, *args, **kwargs):
-        pass
\ No newline at end of file
+        # 캐시된 결과가 있으면 장비에 요청하지 않음, 실패 시 ConnectorError
+        config = config or {}
+        return check_health(config, config.get("healthcheckttl"), config.get("healthchecktimeout"))
+
+    def on_update_config(self, old_config, new_config, active):
+        # 장비/계정이 바뀌면 풀링된 세션과 캐시된 토큰을 버린다
+        close_client(old_config)
+        invalidate_health(old_config)
+
+    def on_delete_config(self, config):
+        close_client(config)
+        invalidate_health(config)
+
+    def teardown(self, *args, **kwargs):
+        close_all_clients()
@@ -1 +1,77 @@
-LOGGER_NAME = 'withconnector_ahnlab'
\ No newline at end of file
+import os
+import tempfile
+
+LOGGER_NAME = 'withconnector_ahnlab'
+
+# TrusGuard REST API
+DEFAULT_TIMEOUT = 30
+VERIFY_SSL = False
+DEFAULT_LOGIN_ATTEMPT = 5
+
+# 로그인 재시도: jitter 지수 backoff + 장비별 circuit breaker
+AUTH_BACKOFF_BASE = 5
+AUTH_BACKOFF_CEILING = 120
+AUTH_BREAKER_THRESHOLD = 5
+AUTH_BREAKER_COOLDOWN = 300
+
+# 세션 풀 / 토큰 재사용
+TOKEN_TTL_SECONDS = 600
+# 업로드 -> bulk처럼 한 세션으로 끝내야 하는 작업 전에, 토큰이 이보다 적게 남았으면 미리 새로 로그인
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+POOL_MAXSIZE = 10
+
+# 첨부파일 다운로드 동시성
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+# bulk 항목 삭제 (장비가 인덱스를 재정렬할 수 있어 기본은 순차 삭제)
+DEFAULT_DELETE_WORKERS = 1
+DEFAULT_DELETE_RETRIES = 3
+DELETE_BACKOFF_SECONDS = 1
+
+# 로컬 상태 파일 (증분 업로드 인덱스 등)
+STATE_DIR = os.path.join(tempfile.gettempdir(), 'withconnector_ahnlab')
+
+# bulk 검색 페이지/캐시
+DEFAULT_SEARCH_PAGE_SIZE = 0
+SEARCH_PAGE_PARAM = 'page'
+SEARCH_SIZE_PARAM = 'limit'
+SEARCH_CACHE_TTL = 30
+
+# 분할 업로드 (chunkrows/chunkbytes가 0이면 한 번에 업로드).
+# 조각마다 별도 세션(lane)으로 upload -> bulk 하므로, 장비의 업로드 대기 파일이
+# 세션별로 분리된다는 것이 확인된 경우에만 동시 전송 수를 늘린다.
+DEFAULT_CHUNK_ROWS = 0
+DEFAULT_CHUNK_BYTES = 0
+DEFAULT_CHUNK_WORKERS = 1
+DEFAULT_CHUNK_RETRIES = 2
+CHUNK_RETRY_BACKOFF_SECONDS = 1
+
+# check_health: 짧은 timeout으로 한 번만 확인하고 결과를 TTL 동안 재사용
+HEALTH_CHECK_TTL = 60
+HEALTH_CHECK_TIMEOUT = 5
+
+# 여러 장비(targets)에 동시에 반영할 때의 최대 동시 장비 수
+DEFAULT_TARGET_WORKERS = 8
+
+# 정규화/병합 메모리 상한 (MB). 넘으면 정렬된 run을 임시 파일로 내보내고 k-way 병합
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# 첨부파일 디스크 캐시 (file IRI -> sha256 -> 내용/파싱 결과), 0이면 사용하지 않음
+DEFAULT_ARTIFACT_CACHE_MB = 1024
+
+# delete_merge 진행 기록: 실패 후 같은 파라미터로 재실행하면 이 시간 안의 기록에서 이어서 진행
+JOURNAL_TTL_SECONDS = 6 * 3600
+
+# 장비별 governor: 프로세스 전체의 동시 세션(작업) 수와 초당 요청 수(토큰 버킷, 0이면 제한 없음).
+# 자리가 없으면 도착 순서대로 GOVERNOR_QUEUE_TIMEOUT초까지 기다린다
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_REQUESTS_PER_SECOND = 20
+DEFAULT_REQUEST_BURST = 40
+GOVERNOR_QUEUE_TIMEOUT = 600
+
+# upload_batch: 배치 하나(업로드 1번 + bulk 1번)에 묶을 첨부파일 수, 0이면 전체를 한 배치로
+DEFAULT_BATCH_SIZE = 0
+
+# 업로드 multipart 파일명: 장비가 file_name으로 기록하므로 기존 코드가 보내던 이름 그대로 쓴다
+UPLOAD_FILE_NAME = os.path.join('/tmp/', 'blacklist.csv')
+MERGE_FILE_NAME = os.path.join(tempfile.gettempdir(), 'merged_blacklist.csv')
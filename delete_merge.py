@@ -1,36 +1,91 @@
 from connectors.core.connector import get_logger, ConnectorError
-from connectors.cyops_utilities.builtins import download_file_from_cyops
-import requests
-import urllib3
-import csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import Counter
+import itertools
 import os
-import tempfile
-import re
+import requests
 import time
-from datetime import datetime
+import urllib3
+from .applied import AppliedIndex
+from .artifacts import artifact_cache, parse_file_iris, fetch_artifacts, remove_files
+from .chunked import ChunkedUpload
+from .client import get_client, device_name, device_governor, StagedUpload
+from .fanout import target_configs, combine_results
+from .metrics import RunMetrics
+from .constants import (DEFAULT_DOWNLOAD_WORKERS, DEFAULT_DELETE_WORKERS, DEFAULT_DELETE_RETRIES,
+                        DELETE_BACKOFF_SECONDS, DEFAULT_SEARCH_PAGE_SIZE, DEFAULT_CHUNK_ROWS,
+                        DEFAULT_CHUNK_BYTES, DEFAULT_CHUNK_WORKERS, DEFAULT_CHUNK_RETRIES,
+                        DEFAULT_TARGET_WORKERS, DEFAULT_MEMORY_BUDGET_MB, MERGE_FILE_NAME)
+from .journal import RunJournal
+from .utils import to_int, to_bool, iter_csv_rows
+from .multipart import multipart_body
+from .normalize import normalize_files
+from .responses import (decode_response, response_detail, result_mode, compact_normalize, compact_delete,
+                        compact_chunks, RESULT_COMPACT)
+from .search import search_entries, date_range, invalidate as invalidate_search
 
 logger = get_logger("trusguard-bulk-connector")
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-TMP_DIR = tempfile.gettempdir()
+
+
+def _not_sent(err):
+    # 연결 자체를 못 맺은 경우만 DELETE가 장비에 닿지 않았다고 확신할 수 있다
+    if isinstance(err, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(err.args[0], "reason", None) if err.args else None
+    return isinstance(err, requests.exceptions.ConnectionError) and \
+        isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def _delete_target(item):
+    # 삭제 대상: 인덱스 + 그 인덱스가 가리켜야 하는 항목 (장비가 인덱스를 당기면 다른 항목이 온다)
+    return {"index": int(item["index"]), "file_name": item.get("file_name"), "description": item.get("description")}
+
+
+def _same_entry(item, target):
+    return item.get("file_name") == target["file_name"] and item.get("description") == target["description"]
+
+
+def _identity(item):
+    return item.get("file_name"), item.get("description")
+
 
 def delete_merge(config, params):
 
-    trusguardip = config.get("trusguardip")
-    trusguardport = config.get("trusguardport")
-    BASE_URL = f"https://{trusguardip}:{trusguardport}"
-    TIMEOUT = 30
-    VERIFY_SSL = False
-    ID = config.get("trusguardid")
-    PASSWORD = config.get("trusguardpassword")
-    INTERVAL_SECONDS = 600
+    # targets로 여러 장비를 주면 다운로드/병합은 한 번만 하고 장비마다 동시에 반영한다
+    TARGETS = target_configs(config, params.get("targets"))
+    TARGET_WORKERS = to_int(params.get("targetworkers"), DEFAULT_TARGET_WORKERS)
+    shared = RunMetrics("delete_merge", device_name(TARGETS[0]))
+    run_metrics = {device_name(target): RunMetrics("delete_merge", device_name(target)) for target in TARGETS}
 
     DELETE_DESCRIPTION = params.get("deletedescription", "")
     MERGE_DESCRIPTION = params.get("mergedescription", "")
     
     END_DATE = params.get("enddate")
-    FILE_IRIS = params.get("fileiris", [])
+    FILE_IRIS = parse_file_iris(params.get("fileiris"))
     LOGIN_ATTEMPT = params.get("loginattempt")
-    TOKEN = None
+    LOGIN_RETRY_MAX_DELAY = params.get("loginretrymaxdelay")
+    DOWNLOAD_WORKERS = to_int(params.get("downloadworkers"), DEFAULT_DOWNLOAD_WORKERS)
+    NORMALIZE = to_bool(params.get("normalize"), True)
+    PIPELINE = to_bool(params.get("pipeline"), True)
+    SEARCH_PAGE_SIZE = to_int(params.get("searchpagesize") or config.get("searchpagesize"), DEFAULT_SEARCH_PAGE_SIZE,
+                              minimum=0)
+    DELETE_WORKERS = to_int(params.get("deleteworkers"), DEFAULT_DELETE_WORKERS)
+    DELETE_RETRIES = to_int(params.get("deleteretries"), DEFAULT_DELETE_RETRIES, minimum=0)
+    CHUNK_ROWS = to_int(params.get("chunkrows"), DEFAULT_CHUNK_ROWS, minimum=0)
+    CHUNK_BYTES = to_int(params.get("chunkbytes"), DEFAULT_CHUNK_BYTES, minimum=0)
+    CHUNK_WORKERS = to_int(params.get("chunkworkers"), DEFAULT_CHUNK_WORKERS)
+    CHUNK_RETRIES = to_int(params.get("chunkretries"), DEFAULT_CHUNK_RETRIES, minimum=0)
+    CHUNKED = bool(CHUNK_ROWS or CHUNK_BYTES)
+    MEMORY_BUDGET_MB = to_int(params.get("memorybudgetmb"), DEFAULT_MEMORY_BUDGET_MB)
+    # 재실행하거나 같은 파일을 다음 달 병합에 다시 쓸 때 다운로드/파싱을 건너뛴다
+    cache = artifact_cache(params)
+    # compact: 검색 결과 전체/응답 본문 대신 개수·인덱스·상태 코드만 결과에 남긴다
+    COMPACT = result_mode(params.get("resultmode")) == RESULT_COMPACT
+    # 실패한 실행을 같은 파라미터로 다시 돌리면 장비별 진행 기록(검색 결과, 반영된 조각, 삭제한 인덱스, bulk)에서 이어서 진행
+    RESUME = to_bool(params.get("resume"), True)
+    JOURNAL_KEY = {"fileiris": FILE_IRIS, "enddate": END_DATE, "mergedescription": MERGE_DESCRIPTION,
+                   "deletedescription": DELETE_DESCRIPTION, "normalize": NORMALIZE,
+                   "chunkrows": CHUNK_ROWS, "chunkbytes": CHUNK_BYTES}
 
     if not END_DATE:
         raise ConnectorError("Parameter 'end_date' is required.")
@@ -38,254 +93,353 @@ def delete_merge(config, params):
         raise ConnectorError("Parameter 'file_iris' list is required.")
 
     def download_and_merge(fileiris):
-        merged_rows = []
-        for file_iri in fileiris:
-            rows = get_file_content(file_iri)
-            merged_rows.extend(rows)
-        return merged_rows
-
-    def alert(stage, last_result):
-        stage_repr = "Warning" if stage == 3 else "Retry" if stage < 5 else "Critical"
-        logger.error(f"[Auth Retry {stage_repr}] {stage} consecutive failures: {last_result}")
-
-    def authenticate():
-        token_url = f"{BASE_URL}/token"
-        login_url = f"{BASE_URL}/login"
-        payload = {"id": ID, "password": PASSWORD}
-        last_result = None
-
-        # 기본값 5, 숫자가 아니거나 None일 경우 fallback
-        max_attempt = int(LOGIN_ATTEMPT) if LOGIN_ATTEMPT and str(LOGIN_ATTEMPT).isdigit() else 5
-
-        for attempt in range(1, max_attempt + 1):
-            try:
-                resp = requests.post(token_url, json=payload, verify=VERIFY_SSL, timeout=TIMEOUT)
-                token_json = resp.json() if resp.headers.get('content-type', '').startswith('application/json') else None
-                token = token_json.get("token") if resp.status_code == 200 and token_json else None
-            except Exception as e:
-                token = None
-                token_json = {"error": str(e)}
-                resp = None
-
-            if token:
-                headers = {"key": "Authorization", "Authorization": token}
-                try:
-                    resp2 = requests.post(login_url, headers=headers, verify=VERIFY_SSL, timeout=TIMEOUT)
-                    login_json = resp2.json() if resp2.headers.get('content-type', '').startswith('application/json') else None
-                    login_detail = {
-                        "status_code": resp2.status_code,
-                        "response": login_json if resp2.status_code == 200 else resp2.text
-                    }
-                    if resp2.status_code == 200:
-                        return token, login_json
-                    else:
-                        last_result = {
-                            "stage": "login",
-                            "attempt": attempt,
-                            "resp_json": login_json,
-                            "code": resp2.status_code
-                        }
-                except Exception as e:
-                    last_result = {
-                        "stage": "login_exception",
-                        "error": str(e)
-                    }
-            else:
-                last_result = {
-                    "stage": "get_token",
-                    "attempt": attempt,
-                    "resp_json": token_json,
-                    "code": getattr(resp, "status_code", None)
-                }
-
-            if attempt < max_attempt:
-                time.sleep(INTERVAL_SECONDS)
-        raise ConnectorError(f"Login failed after {max_attempt} attempts, {login_json}")
-        
-    def search_indices(base_url, description, timeout, verify_ssl):
-        url = f"{base_url}/policy/access_block/blacklist/bulk/search"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": TOKEN
-        }
-        resp = requests.get(url, headers=headers, timeout=timeout, verify=verify_ssl)
+        """
+        파일을 모두 내려받은 뒤, 병합 결과 row generator를 만드는 함수를 반환 (전체 row 리스트를 만들지 않음).
+        장비마다 새 generator로 다시 읽는다. NORMALIZE면 중복 제거/CIDR 병합 결과와 리포트를 함께 반환하고,
+        파일은 정규화하면서 바로 지운다. 아니면 모든 장비에 반영한 뒤 지운다.
+        정규화 run 파일은 MEMORY_BUDGET_MB를 넘을 때만 생기며, 모든 장비에 반영한 뒤 cleanup에서 지운다.
+        """
+        with shared.phase("download"):
+            paths = fetch_artifacts(fileiris, DOWNLOAD_WORKERS, cache)
+        shared.add("download", nbytes=sum(os.path.getsize(path) for path in paths))
+        if not NORMALIZE:
+            return paths, lambda: itertools.chain.from_iterable(iter_csv_rows(path) for path in paths), None
         try:
-            response_json = resp.json()
+            with shared.phase("parse"):
+                normalizer = normalize_files(paths, sources=fileiris, remove=True,
+                                             memory_budget=MEMORY_BUDGET_MB * 1024 * 1024, cache=cache)
+                cleanup.append(normalizer.close)
+                normalize_detail = normalizer.report
+            shared.add("parse", rows=normalizer.input_rows)
         except Exception:
-            response_json = resp.text
+            remove_files(paths)
+            raise
+        return paths, normalizer.rows, normalize_detail
 
-        if resp.status_code == 200:
-            indices = [item['index'] for item in response_json.get('result', [])] \
-                if isinstance(response_json, dict) else []
-            logger.info(f"Search success: {response_json}")
-            return indices, response_json
-        else:
-            logger.error(f"Search failed: {response_json}")
-            return [], response_json
+    def response_summary(resp):
+        # full: 파싱한 본문 그대로, compact: 상태 코드 (실패면 본문 포함)
+        return response_detail(resp, compact=True) if COMPACT else decode_response(resp)
 
+    def push(target, prepared):
+        """
+        장비 하나에 업로드 -> 삭제 -> bulk. prepared(Future)에서 병합 row를 받는다.
+        """
+        metrics = run_metrics[device_name(target)]
+        # 같은 장비에 동시에 도는 작업 수 제한: 받은 자리 번호의 세션(lane)을 쓰고, 자리가 없으면 차례를 기다린다.
+        # 다운로드/병합을 기다리는 동안에는 자리를 잡고 있지 않는다 (그동안 다른 작업이 장비를 쓸 수 있도록)
+        governor = device_governor(target)
+        lane = client = None
 
-    def filter_by_date_and_description(results, end_date, delete_description):
-        import re
-        from datetime import datetime
-    
-        s = str(end_date)
-        if '-' in s:
-            s = datetime.strptime(s, "%Y-%m-%d").strftime("%Y%m%d")
-        elif re.fullmatch(r"\d{6}", s):
-            s = "20" + s
-        elif not re.fullmatch(r"\d{8}", s):
-            raise ValueError(f"Invalid end_date: {s}")
-    
-        start = s[:6] + "01"
-        logger.debug(f"Filtering from {start} to {s}, desc contains '{delete_description}'")
-    
-        matched = []
-        for item in results:
-            fn = item.get("file_name")
-            desc = item.get("description")
-            logger.debug(f"Checking item index={item.get('index')}, file_name={fn}, description={desc}")
-    
-            m = re.search(r"(\d{8})", fn or "")
-            if not m:
-                logger.debug("  → no date in file_name")
-                continue
-            file_date = m.group(1)
-            logger.debug(f"  → extracted date {file_date}")
-    
-            if not (start <= file_date <= s):
-                logger.debug("  → date out of range")
-                continue
-    
-            if delete_description.lower() not in (desc or "").lower():
-                logger.debug("  → description does not match")
-                continue
-    
-            logger.debug("  → matched!")
-            matched.append(item)
-    
-        logger.debug(f"Filtered items: {matched}")
-        return matched
+        def take_slot():
+            nonlocal lane, client
+            with metrics.phase("queue"):
+                lane = governor.acquire()
+            client = metrics.instrument(get_client(target, lane))
 
+        def release_slot():
+            nonlocal lane
+            if lane is not None:
+                governor.release(lane)
+                lane = None
 
+        journal = (RunJournal("delete_merge", device_name(target), target.get("trusguardid"), JOURNAL_KEY)
+                   if RESUME else None)
 
-    def delete_indices(indices):
-        url = f"{BASE_URL}/policy/access_block/blacklist/bulk"
-        headers = {"Content-Type": "application/json", "Authorization": TOKEN}
-        normalized = sorted({int(i) for i in indices}, reverse=True)
-        logger.debug(f"Deleting indices: {normalized}")
-        responses = []
-        for idx in normalized:
+        def still_targeted(target):
+            """
+            앞선 DELETE가 장비에 닿았을 수 있을 때 (타임아웃/5xx/응답 전 연결 끊김) 다시 보내도 되는지 검색으로 확인.
+            "present": 인덱스가 아직 같은 항목, "gone": 항목이 없어짐 (앞 요청이 지운 것),
+            "moved"/"unverified": 다른 항목이 그 인덱스로 왔거나 검색 실패 -> 다시 보내지 않는다.
+            """
+            with metrics.phase("search"):
+                entry_index = search_entries(client, SEARCH_PAGE_SIZE, ttl=0)
+            if not entry_index.complete:
+                return "unverified"
+            item = entry_index.find(target["index"])
+            if item is not None and _same_entry(item, target):
+                return "present"
+            if any(_same_entry(other, target) for other in entry_index.entries):
+                return "moved"
+            return "gone"
+
+        def delete_index(target):
+            """
+            인덱스 하나 삭제. 연결을 못 맺은 경우는 그대로, 타임아웃/5xx처럼 장비가 이미 지웠을 수 있는 경우는
+            인덱스가 아직 같은 항목을 가리키는지 확인한 뒤 backoff 후 DELETE_RETRIES번까지 재시도.
+            """
+            idx = target["index"]
+            headers = {"Content-Type": "application/json"}
             payload = {"index": str(idx)}
-            logger.debug(f"DELETE URL: {url}, payload: {payload}")
-            resp = requests.delete(url, headers=headers, json=payload,
-                                   timeout=TIMEOUT, verify=VERIFY_SSL)
+            result = {"index": idx, "attempts": 0}
+            sent = False
+            for attempt in range(1, DELETE_RETRIES + 2):
+                if sent:
+                    state = still_targeted(target)
+                    if state == "gone":
+                        result.update({"status_code": 200, "verified": state})
+                        break
+                    if state != "present":
+                        result["verified"] = state
+                        break
+                result["attempts"] = attempt
+                try:
+                    resp = client.request("DELETE", "/policy/access_block/blacklist/bulk", headers=headers, json=payload)
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as err:
+                    sent = not _not_sent(err)
+                    result.update({"status_code": None, "response": str(err)})
+                else:
+                    sent = True
+                    result.update({"status_code": resp.status_code, "response": decode_response(resp)})
+                    if resp.status_code < 500:
+                        break
+                if attempt <= DELETE_RETRIES:
+                    time.sleep(DELETE_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+            if result["status_code"] == 200 and journal is not None:
+                journal.append("deleted", target)
+            logger.debug(f"DELETE response idx={idx}: {result}")
+            return result
+
+        def delete_indices(targets):
+            """
+            큰 인덱스부터 삭제 (장비가 인덱스를 당기더라도 남은 대상이 바뀌지 않도록).
+            DELETE_WORKERS > 1이면 동시에 삭제하므로, 인덱스가 삭제 후에도 유지되는 장비에서만 사용.
+            """
+            normalized = sorted({t["index"]: t for t in targets}.values(), key=lambda t: t["index"], reverse=True)
+            logger.debug(f"Deleting indices: {[t['index'] for t in normalized]}")
+            if DELETE_WORKERS > 1 and len(normalized) > 1:
+                with ThreadPoolExecutor(max_workers=min(DELETE_WORKERS, len(normalized))) as pool:
+                    results = list(pool.map(delete_index, normalized))
+            else:
+                results = [delete_index(target) for target in normalized]
+
+            summary = {"succeeded": [], "failed": [], "retried": []}
+            for result in results:
+                if result["attempts"] > 1:
+                    summary["retried"].append(result["index"])
+                if result["status_code"] == 200:
+                    summary["succeeded"].append(result["index"])
+                else:
+                    summary["failed"].append(result)
+            return summary
+
+        def upload_file(rows):
+            # 병합 row를 임시 파일 없이 바로 multipart 본문으로 스트리밍 (rows()를 다시 불러 재전송 가능)
+            body, content_type = multipart_body("blacklist_csv", MERGE_FILE_NAME, rows)
+            up_headers = {"key": "Authorization", "Content-Type": content_type}
+            metrics.add("upload", nbytes=len(body))
             try:
-                content = resp.json()
-            except Exception:
-                content = resp.text
-            logger.debug(f"DELETE response idx={idx}: {resp.status_code}, {content}")
-            responses.append({"index": idx, "status_code": resp.status_code, "response": content})
-        return responses
-      
-    def get_file_content(file_iri):
+                with metrics.phase("upload"):
+                    resp = client.request("POST", "/policy/access_block/blacklist/bulk/upload", headers=up_headers,
+                                          data=body)
+            finally:
+                body.close()
+            return resp.status_code == 200, response_summary(resp)
+
+        def call_bulk(staged):
+            # 업로드한 세션의 토큰으로만 보낸다 (삭제 중 토큰이 바뀌었으면 staged가 먼저 다시 업로드)
+            headers = {"Content-Type": "application/json"}
+            payload = {"description": MERGE_DESCRIPTION, "expire_enable": "0"}
+            resp = staged.bulk(lambda token: client.request("POST", "/policy/access_block/blacklist/bulk",
+                                                            headers=headers, json=payload, token=token))
+            return resp.status_code == 200, response_summary(resp)
+
+        def login():
+            _, login_detail = client.authenticate(LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY)
+            logger.info(f"Login detail: {login_detail}")
+            return login_detail
+
+        def locate_targets(matched, deleted=()):
+            """
+            앞서 고른 삭제 대상(matched) 중 아직 지우지 않은 항목만, 지금 검색 결과에서 같은 file_name/description을
+            가진 항목으로 다시 찾는다. 그 사이 다른 작업(다른 프로세스 포함)이 항목을 지우거나 반영해 장비가 인덱스를
+            당겼을 수 있으므로 기록된 번호는 쓰지 않는다. 그 뒤에 반영한 조각은 matched에 없으므로 섞이지 않는다.
+            (응답, 대상, 사라진 항목) 반환.
+            """
+            with metrics.phase("search"):
+                entry_index = search_entries(client, SEARCH_PAGE_SIZE, ttl=0)
+            metrics.add("search", rows=len(entry_index))
+            if not entry_index.complete:
+                raise ConnectorError("Search failed; delete targets cannot be verified")
+            pending = Counter(_identity(t) for t in matched)
+            pending.subtract(_identity(t) for t in deleted)
+            targets = []
+            for item in entry_index.entries:
+                if pending[_identity(item)] > 0:
+                    pending[_identity(item)] -= 1
+                    targets.append(_delete_target(item))
+            vanished = [{"file_name": name, "description": desc}
+                        for (name, desc), count in pending.items() for _ in range(count)]
+            logger.info(f"Located delete targets on {client.device}: {len(targets)} still present, "
+                        f"{len(vanished)} no longer found")
+            return {"result": entry_index.entries}, targets, vanished
+
+        def find_indices_to_delete():
+            # 이전 실행이 삭제 대상을 기록해 두었으면 그 항목만 다시 찾는다
+            recorded = journal.get("search") if journal is not None else None
+            if recorded is not None:
+                return locate_targets(recorded["matched"], journal.get("deleted", []))
+
+            # 1) 검색 (페이지 단위). 삭제 대상을 고르므로 캐시(다른 프로세스의 변경이 보이지 않는다)는 쓰지 않는다
+            with metrics.phase("search"):
+                entry_index = search_entries(client, SEARCH_PAGE_SIZE, ttl=0)
+            metrics.add("search", rows=len(entry_index))
+
+            # 2) 필터링 (날짜/description 색인 조회)
+            start, end = date_range(END_DATE)
+            targets = [_delete_target(item) for item in entry_index.select(start, end, DELETE_DESCRIPTION)]
+            logger.info(f"1일부터 '{END_DATE}'까지, description '{DELETE_DESCRIPTION}' 일치 인덱스: "
+                        f"{[t['index'] for t in targets]}")
+            if journal is not None:
+                journal.set("search", {"matched": targets})
+            return {"result": entry_index.entries}, targets, []
+
+        def upload_chunks(rows):
+            # 조각마다 upload -> bulk(MERGE_DESCRIPTION)로 바로 반영하고, 실패한 조각만 재전송
+            uploader = ChunkedUpload(target, metrics, MERGE_DESCRIPTION, CHUNK_WORKERS, CHUNK_RETRIES,
+                                     LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY, lane, MERGE_FILE_NAME)
+            skip, on_commit = (), None
+            if journal is not None:
+                skip, on_commit = journal.get("chunks", []), lambda number: journal.append("chunks", number)
+            with metrics.phase("upload"):
+                summary = uploader.run(rows, CHUNK_ROWS, CHUNK_BYTES, skip, on_commit)
+            if summary["committed"]:
+                invalidate_search(client.device)
+            return not summary["failed"], summary
+
+        # PIPELINE: 로그인 -> 검색/필터링을 다운로드·병합과 동시에 진행한다.
+        # 검색은 읽기 전용이고 새 병합 항목은 bulk 전까지 검색에 나오지 않으므로 순서를 당겨도 결과가 같다.
+        # 삭제는 업로드 성공 후, bulk는 항상 마지막.
+        # CHUNKED: 조각마다 bulk가 바로 반영되므로 검색을 먼저 끝내고(새 항목이 삭제 대상에 섞이지 않도록),
+        # 모든 조각이 반영된 뒤에 기존 항목을 삭제한다. 마지막 bulk는 호출하지 않는다.
+        # RESUME: 반영된 조각/삭제한 인덱스/bulk는 건너뛴다. 분할하지 않은 업로드는 bulk 전까지
+        # 세션에만 올라가 있으므로 bulk가 끝나지 않았으면 다시 업로드한다.
         try:
-            dw_file_md = download_file_from_cyops(file_iri)
-            file_path = os.path.join(TMP_DIR, dw_file_md['cyops_file_path'])
-            with open(file_path, encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
+            found = None
+            if PIPELINE:
+                take_slot()
+                login_detail = login()
+                found = find_indices_to_delete()
+                if not prepared.done():
+                    release_slot()
+
+            # 파일 병합 결과 (장비를 변경하기 전에 잘못된 row를 걸러낸다)
             try:
-                os.remove(file_path)
-            except Exception:
-                pass
-            return rows
-        except Exception as err:
-            logger.error(f"Failed to download or read artifact file '{file_iri}': {err}")
-            raise ConnectorError(f"Failed to download or read artifact file '{file_iri}': {err}")
-
-    def upload_file(rows):
-        csv_path = os.path.join(TMP_DIR, "merged_blacklist.csv")
-        try:
-            with open(csv_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
-            url = f"{BASE_URL}/policy/access_block/blacklist/bulk/upload"
-            up_headers = {"key": "Authorization", "Authorization": TOKEN}
-            with open(csv_path, "rb") as f:
-                files = {"blacklist_csv": (csv_path, f, "text/csv")}
-                resp = requests.post(url, headers=up_headers, files=files, timeout=TIMEOUT, verify=VERIFY_SSL)
-            if resp.status_code == 200:
-                try:
-                    return True, resp.json()
-                except Exception:
-                    return True, resp.text
+                merged_rows = prepared.result()
+            finally:
+                metrics.merge(shared)
+
+            if lane is None:
+                take_slot()
+                login_detail = login()
+            if CHUNKED and found is None:
+                found = find_indices_to_delete()
+
+            # 업로드
+            applied = journal is not None and journal.get("bulk") is not None
+            if applied:
+                upload_ok, upload_resp = True, None
+            elif CHUNKED:
+                upload_ok, upload_resp = upload_chunks(merged_rows())
             else:
-                return False, resp.text
+                staged = StagedUpload(client, lambda: upload_file(merged_rows), LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY)
+                upload_ok, upload_resp = staged.upload()
+            if not upload_ok:
+                raise ConnectorError(f"File upload failed: {upload_resp}")
+
+            if found is not None and found[1]:
+                # 업로드 전에 고른 대상: 업로드하는 동안 인덱스가 바뀌었을 수 있으므로 삭제 직전에 다시 찾는다
+                _, located, moved_out = locate_targets(found[1])
+                found = found[0], located, found[2] + moved_out
+            resp_json, targets, vanished = found if found is not None else find_indices_to_delete()
+            indices_to_delete = [t["index"] for t in targets]
+
+            # 3) 삭제 (이전 실행에서 지운 항목은 resume_targets에서 이미 빠졌다)
+            previously_deleted = journal.get("deleted", []) if journal is not None else []
+            with metrics.phase("delete"):
+                delete_summary = delete_indices(targets)
+            metrics.add("delete", rows=len(delete_summary["succeeded"]))
+            if delete_summary["failed"]:
+                logger.warning(f"Failed to delete indices on {client.device}: {delete_summary['failed']}")
+            if delete_summary["succeeded"] or previously_deleted:
+                # 장비에서 항목이 지워졌으므로 증분 업로드 인덱스/검색 캐시는 더 이상 믿을 수 없다
+                AppliedIndex(client.device, client.username).reset()
+                invalidate_search(client.device)
+
+            # bulk 호출 (분할 업로드는 조각마다 이미 반영됨)
+            bulk_resp = None
+            if applied:
+                bulk_resp = journal.get("bulk")
+            elif not CHUNKED:
+                with metrics.phase("bulk"):
+                    bulk_ok, bulk_resp = call_bulk(staged)
+                invalidate_search(client.device)
+                if not bulk_ok:
+                    raise ConnectorError(f"Bulk apply failed: {bulk_resp}")
+                if journal is not None:
+                    journal.set("bulk", bulk_resp)
+
+            logger.info(f"Deleted indices on {client.device}: {delete_summary['succeeded']}, "
+                        f"retried: {delete_summary['retried']}")
+
+            journal_detail = None
+            if journal is not None:
+                journal_detail = {
+                    "resumed": journal.resumed,
+                    "skipped_chunks": (upload_resp or {}).get("skipped", []) if CHUNKED else [],
+                    "previously_deleted": previously_deleted,
+                    "vanished": vanished,
+                    "bulk_skipped": applied,
+                }
+                journal.clear()
+
+            if COMPACT:
+                deleted_response = {
+                    "searched": len(resp_json["result"]),
+                    "matched": indices_to_delete,
+                    "description": DELETE_DESCRIPTION,
+                    "delete_results": compact_delete(delete_summary)
+                }
+                upload_resp = compact_chunks(upload_resp) if CHUNKED else upload_resp
+            else:
+                deleted_response = {
+                    "response_json": resp_json,
+                    "description": DELETE_DESCRIPTION,
+                    "delete_results": delete_summary
+                }
+            return {
+                "success": True,
+                "login_detail": None if COMPACT else login_detail,
+                "deleted_response": deleted_response,
+                "upload_response": upload_resp,
+                "bulk_response": bulk_resp,
+                "journal_detail": journal_detail,
+                "metrics": metrics.finish(True)
+            }
+
+        except Exception as e:
+            logger.error(f"delete_merge failed on {device_name(target)}: {str(e)}")
+            return {"success": False, "error": str(e), "metrics": metrics.finish(False)}
         finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
-
-    def call_bulk():
-        url = f"{BASE_URL}/policy/access_block/blacklist/bulk"
-        headers = {"Content-Type": "application/json", "Authorization": TOKEN}
-        payload = {"description": MERGE_DESCRIPTION, "expire_enable": "0"}
-        resp = requests.post(url, headers=headers, json=payload, timeout=TIMEOUT, verify=VERIFY_SSL)
-        if resp.status_code == 200:
-            try:
-                return True, resp.json()
-            except Exception:
-                return True, resp.text
-        else:
-            return False, resp.text
+            release_slot()
 
+    # 장비별 작업은 먼저 시작해 두고(PIPELINE이면 로그인/검색 진행), 다운로드·병합이 끝나면 prepared로 넘긴다
+    prepared = Future()
+    downloaded, normalize_detail, cleanup = [], None, []
     try:
-        TOKEN, login_detail = authenticate()
-        logger.info(f"Login detail: {login_detail}")
-
-        # 파일 병합
-        merged_rows = download_and_merge(FILE_IRIS)
-        if not merged_rows:
-            raise ConnectorError("No merged data found in merge files.")
-
-        # 업로드
-        upload_ok, upload_resp = upload_file(merged_rows)
-        if not upload_ok:
-            raise ConnectorError(f"File upload failed: {upload_resp}")
-            
-        # 1) 검색
-        indices, resp_json = search_indices(BASE_URL, DELETE_DESCRIPTION, TIMEOUT, VERIFY_SSL)
-        raw_results = resp_json.get("result", []) if isinstance(resp_json, dict) else []
-
-
-        # 2) 필터링
-        filtered_items = filter_by_date_and_description(raw_results, END_DATE, DELETE_DESCRIPTION)
-        indices_to_delete = [item["index"] for item in filtered_items]
-        logger.info(f"1일부터 '{END_DATE}'까지, description '{DELETE_DESCRIPTION}' 일치 인덱스: {indices_to_delete}")
-
-        # 3) 삭제
-        delete_responses = delete_indices(indices_to_delete)
-        for resp in delete_responses:
-            print(f"Index {resp['index']} 삭제 상태: {resp['status_code']}, 응답: {resp['response']}")
-        
-        # bulk 호출
-        bulk_ok, bulk_resp = call_bulk()
-        if not bulk_ok:
-            raise ConnectorError(f"Bulk apply failed: {bulk_resp}")
-
-        logger.info(f"Deleted indices response details: {delete_responses}")
-
-        return {
-            "success": True,
-            "login_detail": login_detail,
-            "deleted_response": {
-                "response_json": resp_json,
-                "description": DELETE_DESCRIPTION,
-                "delete_results": delete_responses
-            },
-            "upload_response": upload_resp,
-            "bulk_response": bulk_resp
-        }
-
-    except Exception as e:
-        logger.error(f"delete_merge failed: {str(e)}")
-        return {"success": False, "error": str(e)}
+        with ThreadPoolExecutor(max_workers=min(TARGET_WORKERS, len(TARGETS))) as pool:
+            futures = [pool.submit(push, target, prepared) for target in TARGETS]
+            try:
+                downloaded, merged_rows, normalize_detail = download_and_merge(FILE_IRIS)
+                if next(iter(merged_rows()), None) is None:
+                    raise ConnectorError("No merged data found in merge files.")
+                prepared.set_result(merged_rows)
+            except Exception as e:
+                prepared.set_exception(e)
+            results = [future.result() for future in futures]
+    finally:
+        remove_files(downloaded)
+        for close in cleanup:
+            close()
+    return combine_results(TARGETS, results,
+                           normalize_detail=compact_normalize(normalize_detail) if COMPACT else normalize_detail,
+                           cache_detail=cache.stats if cache is not None else None)
@@ -0,0 +1,66 @@
+from connectors.core.connector import ConnectorError
+from concurrent.futures import ThreadPoolExecutor
+import json
+import re
+from .client import _client_key, device_name
+
+
+def target_configs(config, targets=None):
+    """
+    targets 파라미터를 장비별 config 목록으로 변환. 없으면 [config] (기존 단일 장비 동작).
+    항목은 "ip", "ip:port", "[ipv6]:port" 문자열 또는 trusguardip/trusguardport/trusguardid/trusguardpassword
+    일부를 담은 dict이며, 빠진 값은 connector config에서 가져온다.
+    문자열로 주면 쉼표/줄바꿈 구분 목록 또는 JSON 배열.
+    """
+    if not targets:
+        return [config]
+    if isinstance(targets, str):
+        text = targets.strip()
+        if text.startswith("["):
+            try:
+                targets = json.loads(text)
+            except ValueError:
+                targets = [text]
+        else:
+            targets = [t for t in re.split(r"[,\s]+", text) if t]
+    configs = []
+    for target in targets:
+        if isinstance(target, dict):
+            configs.append(dict(config, **{k: v for k, v in target.items() if v not in (None, "")}))
+            continue
+        host, port = str(target).strip(), config.get("trusguardport")
+        m = re.fullmatch(r"\[(.+)\](?::(\d+))?|([^:]+):(\d+)", host)
+        if m:
+            host, port = (m.group(1), m.group(2) or port) if m.group(1) else (m.group(3), m.group(4))
+        configs.append(dict(config, trusguardip=host, trusguardport=port))
+    # 같은 장비/계정이 여러 번 나오면 한 번만
+    unique = {}
+    for target in configs:
+        unique.setdefault(_client_key(target), target)
+    if not unique:
+        raise ConnectorError("Parameter 'targets' does not contain any device.")
+    return list(unique.values())
+
+
+def run_targets(targets, push, workers):
+    """
+    push(target)를 장비마다 workers개까지 동시에 실행하고 결과를 targets 순서대로 반환.
+    push는 실패해도 예외를 올리지 않고 장비별 결과 dict를 반환해야 한다 (한 장비의 실패가 다른 장비를 막지 않도록).
+    장비 하나면 호출한 스레드에서 그대로 실행한다.
+    """
+    if len(targets) == 1:
+        return [push(targets[0])]
+    with ThreadPoolExecutor(max_workers=min(workers, len(targets))) as pool:
+        return list(pool.map(push, targets))
+
+
+def combine_results(targets, results, **shared):
+    """
+    장비 하나면 기존 결과 형태 그대로, 여러 대면 {success, devices: {장비: 결과}, failed_devices}.
+    shared는 모든 장비가 함께 쓴 단계의 결과 (예: normalize_detail).
+    """
+    if len(results) == 1:
+        return dict(results[0], **shared)
+    devices = {device_name(target): result for target, result in zip(targets, results)}
+    failed = [name for name, result in devices.items() if not result.get("success")]
+    return dict(shared, success=not failed, devices=devices, failed_devices=failed)
@@ -0,0 +1,167 @@
+from connectors.core.connector import get_logger, ConnectorError
+from collections import deque
+import heapq
+import threading
+import time
+from .constants import (LOGGER_NAME, DEFAULT_MAX_SESSIONS, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_REQUEST_BURST,
+                        GOVERNOR_QUEUE_TIMEOUT)
+
+logger = get_logger(LOGGER_NAME)
+
+
+class TokenBucket(object):
+    """
+    초당 rate개, 최대 burst개까지 모아 쓰는 토큰 버킷. rate가 0이면 제한하지 않는다.
+    acquire()는 도착 순서대로 다음 토큰 시각을 예약하고 잠금 밖에서 기다리므로 먼저 온 요청이 먼저 나간다.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, rate, burst):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(burst, 1)
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self):
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # 음수면 앞에서 예약한 만큼 뒤로 밀린다
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class _Waiter(object):
+    __slots__ = ("event", "slot")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.slot = None
+
+
+class DeviceGovernor(object):
+    """
+    장비 하나에 대한 프로세스 전체의 동시 세션 수와 초당 요청 수 제한.
+    세션 자리(slot)는 0..max_sessions-1 번호이고 get_client(config, slot)의 lane으로 쓰므로,
+    자리를 넘겨받은 작업은 앞 작업이 로그인해 둔 세션/토큰을 그대로 이어 쓴다.
+    자리가 없으면 도착 순서(FIFO)대로 기다리고, 반납된 자리는 가장 오래 기다린 작업에 바로 넘긴다.
+    """
+
+    def __init__(self, device, max_sessions=DEFAULT_MAX_SESSIONS, rate=DEFAULT_REQUESTS_PER_SECOND,
+                 burst=DEFAULT_REQUEST_BURST):
+        self.device = device
+        self.max_sessions = max_sessions
+        self.bucket = TokenBucket(rate, burst)
+        # 번호가 작은 자리부터 쓴다 (최근에 쓴, 토큰이 살아 있는 세션일 가능성이 높다)
+        self._free = list(range(max_sessions))
+        self._held = set()
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.throttled_seconds = 0.0
+
+    def configure(self, max_sessions, rate, burst):
+        self.bucket.configure(rate, burst)
+        with self._lock:
+            if max_sessions == self.max_sessions:
+                return
+            self.max_sessions = max_sessions
+            self._free = [slot for slot in self._free if slot < max_sessions]
+            heapq.heapify(self._free)
+            taken = self._held.union(self._free)
+            for slot in range(max_sessions):
+                if len(self._held) + len(self._free) >= max_sessions:
+                    break
+                if slot not in taken:
+                    self._give(slot)
+
+    def _give(self, slot):
+        # 잠금을 잡은 상태에서 호출
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.slot = slot
+            self._held.add(slot)
+            waiter.event.set()
+        else:
+            heapq.heappush(self._free, slot)
+
+    def acquire(self, timeout=GOVERNOR_QUEUE_TIMEOUT):
+        """
+        세션 자리 번호를 반환. timeout초 안에 자리가 나지 않으면 ConnectorError.
+        """
+        with self._lock:
+            if self._free and not self._waiters:
+                slot = heapq.heappop(self._free)
+                self._held.add(slot)
+                return slot
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            self.queued += 1
+            waiting = len(self._waiters)
+        logger.info(f"Waiting for a TrusGuard session on {self.device} ({waiting} queued)")
+        if not waiter.event.wait(timeout):
+            with self._lock:
+                if waiter.slot is None:
+                    self._waiters.remove(waiter)
+                    raise ConnectorError(f"Timed out after {timeout}s waiting for a TrusGuard session on "
+                                         f"{self.device} (max_sessions={self.max_sessions})")
+        return waiter.slot
+
+    def try_acquire(self):
+        """
+        기다리지 않고 빈 자리 번호를 반환. 빈 자리가 없거나 먼저 기다리는 작업이 있으면 None.
+        """
+        with self._lock:
+            if not self._free or self._waiters:
+                return None
+            slot = heapq.heappop(self._free)
+            self._held.add(slot)
+            return slot
+
+    def release(self, slot):
+        with self._lock:
+            self._held.discard(slot)
+            if slot < self.max_sessions:
+                self._give(slot)
+
+    def throttle(self):
+        delay = self.bucket.acquire()
+        if delay:
+            with self._lock:
+                self.throttled_seconds += delay
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                "max_sessions": self.max_sessions,
+                "active": len(self._held),
+                "waiting": len(self._waiters),
+                "queued_total": self.queued,
+                "requests_per_second": self.bucket.rate,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(device):
+    with _governors_lock:
+        governor = _governors.get(device)
+        if governor is None:
+            governor = _governors[device] = DeviceGovernor(device)
+        return governor
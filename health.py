@@ -0,0 +1,77 @@
+from connectors.core.connector import get_logger, ConnectorError
+import threading
+import time
+from .client import get_client, device_governor, _client_key
+from .constants import LOGGER_NAME, HEALTH_CHECK_TTL, HEALTH_CHECK_TIMEOUT, SEARCH_PAGE_PARAM, SEARCH_SIZE_PARAM
+from .metrics import device_counters
+from .search import SEARCH_PATH
+from .utils import to_int
+
+logger = get_logger(LOGGER_NAME)
+
+# (장비, 계정) -> (확인 시각, 결과 dict 또는 실패 메시지)
+_results = {}
+_locks = {}
+_results_lock = threading.Lock()
+
+
+def probe(config, timeout=HEALTH_CHECK_TIMEOUT):
+    """
+    풀링된 클라이언트로 인증된 요청 한 번만 보낸다. 캐시된 토큰이 있으면 로그인하지 않고,
+    없으면 재시도 없이 한 번만 로그인한다. circuit이 열려 있으면 장비에 요청하지 않고 실패.
+    작업과 같은 세션 자리(lane)를 쓰므로 빈 자리가 있을 때만 보내고 (작업 중인 세션의 토큰을 바꾸지 않도록),
+    모든 자리가 작업 중이면 요청 없이 "Busy"로 보고한다.
+    """
+    governor = device_governor(config)
+    lane = governor.try_acquire()
+    if lane is None:
+        return {"status": "Busy", "device": governor.device, "counters": device_counters(governor.device),
+                "governor": governor.stats}
+    try:
+        client = get_client(config, lane)
+        if client.breaker.is_open:
+            raise ConnectorError(f"Login circuit for {client.device} is open")
+        client.authenticate(login_attempt=1, timeout=timeout)
+        # 검색 결과는 읽지 않는다. searchpagesize를 준 장비(페이지 파라미터를 받는 장비)에서만 1건으로 줄인다
+        page_size = to_int(config.get("searchpagesize"), 0, minimum=0)
+        params = {SEARCH_PAGE_PARAM: 1, SEARCH_SIZE_PARAM: 1} if page_size else None
+        resp = client.request("GET", SEARCH_PATH, headers={"Content-Type": "application/json"}, timeout=timeout,
+                              params=params, stream=True)
+        resp.close()
+        if resp.status_code != 200:
+            raise ConnectorError(f"Health probe to {client.device} returned {resp.status_code}")
+        return {"status": "Available", "device": client.device, "counters": device_counters(client.device),
+                "governor": governor.stats}
+    finally:
+        governor.release(lane)
+
+
+def check_health(config, ttl=None, timeout=None):
+    """
+    ttl초 동안은 마지막 확인 결과(성공/실패 모두)를 그대로 돌려준다.
+    실패면 ConnectorError. 같은 장비에 대한 동시 확인은 한 번의 probe로 합친다.
+    """
+    ttl = to_int(ttl, HEALTH_CHECK_TTL, minimum=0)
+    timeout = to_int(timeout, HEALTH_CHECK_TIMEOUT)
+    key = _client_key(config)
+    with _results_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        cached = _results.get(key)
+        if cached is None or not ttl or time.monotonic() - cached[0] >= ttl:
+            try:
+                result = probe(config, timeout)
+            except Exception as err:
+                logger.warning(f"Health check failed for {key[0]}: {err}")
+                result = str(err)
+            cached = (time.monotonic(), result)
+            _results[key] = cached
+    checked_at, result = cached
+    if not isinstance(result, dict):
+        raise ConnectorError(f"TrusGuard {key[0]} is unreachable: {result}")
+    return dict(result, checked_seconds_ago=round(time.monotonic() - checked_at, 3))
+
+
+def invalidate(config):
+    with _results_lock:
+        _results.pop(_client_key(config), None)
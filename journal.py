@@ -0,0 +1,69 @@
+from connectors.core.connector import get_logger
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from .constants import LOGGER_NAME, STATE_DIR, JOURNAL_TTL_SECONDS
+
+logger = get_logger(LOGGER_NAME)
+
+
+class RunJournal(object):
+    """
+    실행 하나(operation + 장비/계정 + 입력 파라미터)의 진행 기록을 STATE_DIR 아래 JSON 파일로 남긴다.
+    실패 후 같은 파라미터로 다시 실행하면 끝난 단계를 이어받고, 성공하면 clear()로 지운다.
+    ttl초보다 오래된 기록은 장비 상태가 바뀌었을 수 있으므로 무시한다.
+    """
+
+    def __init__(self, operation, device, account, key_params, ttl=JOURNAL_TTL_SECONDS):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        key = json.dumps([operation, device, account, key_params], sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{operation}_{device}_{account}")
+        self.path = os.path.join(STATE_DIR, f"journal_{name}_{digest}.json")
+        self._lock = threading.Lock()
+        self.state = self._load(ttl)
+        self.resumed = bool(self.state)
+        if self.resumed:
+            logger.info(f"Resuming {operation} on {device} from journal: {sorted(self.state)}")
+
+    def _load(self, ttl):
+        try:
+            if time.time() - os.path.getmtime(self.path) > ttl:
+                os.remove(self.path)
+                return {}
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        fd, tmp = tempfile.mkstemp(dir=STATE_DIR, prefix=".journal_")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def get(self, name, default=None):
+        with self._lock:
+            return self.state.get(name, default)
+
+    def set(self, name, value):
+        with self._lock:
+            self.state[name] = value
+            self._write()
+
+    def append(self, name, value):
+        with self._lock:
+            self.state.setdefault(name, []).append(value)
+            self._write()
+
+    def clear(self):
+        with self._lock:
+            self.state = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
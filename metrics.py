@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+import threading
+import time
+
+_device_counters = {}
+_device_lock = threading.Lock()
+
+
+def _new_counters():
+    return {"runs": 0, "failures": 0, "phases": {}, "requests": {}}
+
+
+def _add_stat(stats, key, elapsed, error=False):
+    stat = stats.setdefault(key, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+    stat["count"] += 1
+    stat["errors"] += 1 if error else 0
+    stat["total_seconds"] += elapsed
+    stat["max_seconds"] = max(stat["max_seconds"], elapsed)
+
+
+def device_counters(device=None):
+    """
+    프로세스 시작 이후 장비별 누적 카운터 (실행 수, 단계별 시간/건수, 엔드포인트별 요청 수/지연)
+    """
+    with _device_lock:
+        if device is not None:
+            counters = _device_counters.get(device)
+            return _snapshot(counters) if counters else _new_counters()
+        return {name: _snapshot(counters) for name, counters in _device_counters.items()}
+
+
+def _snapshot(counters):
+    return {
+        "runs": counters["runs"],
+        "failures": counters["failures"],
+        "phases": {k: dict(v) for k, v in counters["phases"].items()},
+        "requests": {k: dict(v) for k, v in counters["requests"].items()},
+    }
+
+
+class RunMetrics(object):
+    """
+    한 번의 operation 실행에 대한 단계별 시간/바이트/row 수와 엔드포인트별 HTTP 요청 통계.
+    instrument()로 감싼 클라이언트를 쓰면 요청마다 자동으로 기록된다. 스레드 안전.
+    """
+
+    def __init__(self, operation, device):
+        self.operation = operation
+        self.device = device
+        self.phases = {}
+        self.requests = {}
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                stat = self.phases.setdefault(name, {"seconds": 0.0})
+                stat["seconds"] += elapsed
+
+    def add(self, name, rows=None, nbytes=None):
+        with self._lock:
+            stat = self.phases.setdefault(name, {"seconds": 0.0})
+            if rows is not None:
+                stat["rows"] = stat.get("rows", 0) + rows
+            if nbytes is not None:
+                stat["bytes"] = stat.get("bytes", 0) + nbytes
+
+    def merge(self, other):
+        # 여러 장비가 함께 쓴 단계(다운로드/파싱) 기록을 장비별 실행에 더한다
+        with other._lock:
+            phases = {k: dict(v) for k, v in other.phases.items()}
+        with self._lock:
+            for name, stat in phases.items():
+                own = self.phases.setdefault(name, {"seconds": 0.0})
+                for key, value in stat.items():
+                    own[key] = own.get(key, 0) + value
+
+    def record_request(self, method, path, status_code, elapsed):
+        endpoint = f"{method} {path}"
+        error = status_code is None or status_code >= 400
+        with self._lock:
+            _add_stat(self.requests, endpoint, elapsed, error)
+        with _device_lock:
+            counters = _device_counters.setdefault(self.device, _new_counters())
+            _add_stat(counters["requests"], endpoint, elapsed, error)
+
+    def instrument(self, client):
+        return InstrumentedClient(client, self)
+
+    def finish(self, success):
+        """
+        실행 결과를 장비별 누적 카운터에 반영하고 결과 dict의 metrics 항목을 반환
+        """
+        total = time.monotonic() - self._started
+        with self._lock:
+            phases = {k: dict(v) for k, v in self.phases.items()}
+            requests = {k: dict(v) for k, v in self.requests.items()}
+        with _device_lock:
+            counters = _device_counters.setdefault(self.device, _new_counters())
+            counters["runs"] += 1
+            counters["failures"] += 0 if success else 1
+            for name, stat in phases.items():
+                total_stat = counters["phases"].setdefault(name, {"seconds": 0.0})
+                for key, value in stat.items():
+                    total_stat[key] = total_stat.get(key, 0) + value
+        for stat in phases.values():
+            stat["seconds"] = round(stat["seconds"], 3)
+            if stat.get("bytes") and stat["seconds"]:
+                stat["bytes_per_second"] = int(stat["bytes"] / stat["seconds"])
+        for stat in requests.values():
+            stat["avg_seconds"] = round(stat["total_seconds"] / stat["count"], 3)
+            stat["total_seconds"] = round(stat["total_seconds"], 3)
+            stat["max_seconds"] = round(stat["max_seconds"], 3)
+        return {
+            "operation": self.operation,
+            "device": self.device,
+            "total_seconds": round(total, 3),
+            "http_requests": sum(stat["count"] for stat in requests.values()),
+            "phases": phases,
+            "requests": requests,
+        }
+
+
+class InstrumentedClient(object):
+    """
+    TrusGuardClient를 감싸 request()의 엔드포인트별 횟수/지연을 RunMetrics에 기록한다.
+    나머지 속성은 원래 클라이언트로 그대로 넘긴다.
+    """
+
+    def __init__(self, client, metrics):
+        self._client = client
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def authenticate(self, *args, **kwargs):
+        with self._metrics.phase("login"):
+            return self._client.authenticate(*args, **kwargs)
+
+    def request(self, method, path, *args, **kwargs):
+        started = time.monotonic()
+        status_code = None
+        try:
+            resp = self._client.request(method, path, *args, **kwargs)
+            status_code = resp.status_code
+            return resp
+        finally:
+            self._metrics.record_request(method, path, status_code, time.monotonic() - started)
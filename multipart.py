@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _FileBody(object):
+    """
+    디스크 파일을 multipart 본문으로 감싸 읽는 만큼만 흘려보내는 file-like 객체.
+    길이를 알고 있으므로 requests가 Content-Length를 붙여 스트리밍한다.
+    """
+
+    def __init__(self, head, path, tail):
+        self._head = head
+        self._path = path
+        self._tail = tail
+        self._length = len(head) + os.path.getsize(path) + len(tail)
+        self._parts = None
+        self._file = None
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def seek(self, offset, whence=0):
+        # 재인증 후 재전송할 때 처음부터 다시 읽는다
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation("multipart body can only be rewound")
+        self.close()
+        self._parts = [self._head, None, self._tail]
+
+    def read(self, size=-1):
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        while self._parts:
+            part = self._parts[0]
+            if part is None:
+                if self._file is None:
+                    self._file = open(self._path, "rb")
+                data = self._file.read(size)
+                if data:
+                    return data
+                self._file.close()
+                self._file = None
+                self._parts.pop(0)
+                continue
+            self._parts.pop(0)
+            if len(part) > size:
+                self._parts.insert(0, part[size:])
+                return part[:size]
+            return part
+        return b""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _iter_rows_body(head, rows, tail):
+    yield head
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+    yield tail
+
+
+class _RowsBody(object):
+    """
+    CSV row를 만드는 함수(rows())를 multipart 본문으로 감싼 file-like 객체.
+    한 번 미리 돌려 길이를 재 두므로 Content-Length로 보내고, seek(0)하면 rows()를 다시 불러
+    처음부터 재전송할 수 있다 (임시 파일 없이). rows()는 부를 때마다 같은 row를 내야 한다.
+    """
+
+    def __init__(self, head, rows, tail):
+        self._head = head
+        self._rows = rows
+        self._tail = tail
+        self._length = sum(len(chunk) for chunk in _iter_rows_body(head, rows(), tail))
+        self._chunks = None
+        self._pending = b""
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def seek(self, offset, whence=0):
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation("multipart body can only be rewound")
+        self.close()
+        self._chunks = _iter_rows_body(self._head, self._rows(), self._tail)
+
+    def read(self, size=-1):
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        while len(self._pending) < size and self._chunks is not None:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._chunks = None
+                break
+            self._pending += chunk
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def close(self):
+        if self._chunks is not None:
+            self._chunks.close()
+            self._chunks = None
+        self._pending = b""
+
+
+def multipart_body(field, filename, source, content_type="text/csv"):
+    """
+    파일 경로 또는 CSV row를 만드는 함수를 임시 파일 없이 multipart/form-data 본문으로 만든다.
+    (body, Content-Type 헤더값) 반환. body는 길이를 알고 되감을 수 있어 재인증 후 재전송된다.
+    """
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+    header = f"multipart/form-data; boundary={boundary}"
+    if isinstance(source, str):
+        return _FileBody(head, source, tail), header
+    return _RowsBody(head, source, tail), header
@@ -0,0 +1,529 @@
+from connectors.core.connector import get_logger, ConnectorError
+from array import array
+import heapq
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import tempfile
+from .constants import LOGGER_NAME, DEFAULT_MEMORY_BUDGET_MB
+from .utils import iter_csv_rows
+
+logger = get_logger(LOGGER_NAME)
+
+MAX_REJECTED_SAMPLES = 100
+# save_parsed() 형식 버전: 다르면 load_parsed()가 거부하고 CSV를 다시 파싱한다
+PARSED_FORMAT = 2
+
+_V4_MASK = 0xFFFFFFFF
+# 정렬 중 IPv4 키 하나가 차지하는 대략의 메모리 (array 8 + list 포인터 8 + int 객체)
+_SORT_BYTES_PER_KEY = 64
+# 여러 칸 row 하나의 문자열 외 대략의 메모리 (str 객체 + list 포인터)
+_ROW_OVERHEAD = 80
+_MIN_BLOCK = 4096
+
+
+def _v4(text):
+    return int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+
+
+def parse_entry(text):
+    """
+    블랙리스트 한 칸을 (version, start, end) 정수 범위로 변환. 형식이 틀리면 None.
+    지원: 단일 IP, CIDR(a.b.c.d/n), 범위(a.b.c.d-e.f.g.h), IPv6 동일.
+    """
+    text = text.strip()
+    try:
+        if "/" not in text and "-" not in text:
+            try:
+                value = _v4(text)
+                return 4, value, value
+            except OSError:
+                pass
+        if "-" in text:
+            lo, hi = (ipaddress.ip_address(part.strip()) for part in text.split("-", 1))
+            if lo.version != hi.version or hi < lo:
+                return None
+            return lo.version, int(lo), int(hi)
+        if "/" in text:
+            addr, prefix = text.split("/", 1)
+            try:
+                value, prefix = _v4(addr), int(prefix)
+            except (OSError, ValueError):
+                pass
+            else:
+                if not 0 <= prefix <= 32:
+                    return None
+                host_mask = _V4_MASK >> prefix
+                return 4, value & ~host_mask & _V4_MASK, value | host_mask
+        net = ipaddress.ip_network(text, strict=False)
+        return net.version, int(net.network_address), int(net.broadcast_address)
+    except ValueError:
+        return None
+
+
+def is_header(row):
+    """
+    파일 첫 줄이 헤더인지. 첫 칸이 IP/대역으로 파싱되지 않으면 헤더로 본다 (IPv4, ip_v4처럼 숫자가 있어도).
+    """
+    cell = row[0].strip() if row else ""
+    return bool(cell) and parse_entry(cell) is None
+
+
+def collapse_ranges(ranges):
+    """
+    start 기준으로 정렬된 (start, end) 범위에서 겹치거나 맞닿은 범위를 합친다.
+    """
+    cur_start = cur_end = None
+    for start, end in ranges:
+        if cur_start is None:
+            cur_start, cur_end = start, end
+        elif start <= cur_end + 1:
+            if end > cur_end:
+                cur_end = end
+        else:
+            yield cur_start, cur_end
+            cur_start, cur_end = start, end
+    if cur_start is not None:
+        yield cur_start, cur_end
+
+
+def range_to_cidrs(start, end, bits):
+    """
+    [start, end] 범위를 덮는 최소 개수의 (network, prefix) 목록
+    """
+    while start <= end:
+        size = (start & -start).bit_length() - 1 if start else bits
+        while start + (1 << size) - 1 > end:
+            size -= 1
+        yield start, bits - size
+        start += 1 << size
+
+
+def _write_run(keys, block=65536, dir=None):
+    """
+    정렬된 IPv4 키를 임시 파일에 array('Q') 형식으로 block개씩 기록하고 경로를 반환
+    """
+    fd, path = tempfile.mkstemp(prefix="trusguard_run_", suffix=".bin", dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            buf = array("Q")
+            for key in keys:
+                buf.append(key)
+                if len(buf) >= block:
+                    buf.tofile(f)
+                    buf = array("Q")
+            buf.tofile(f)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _read_run(path, block):
+    with open(path, "rb") as f:
+        while True:
+            buf = array("Q")
+            try:
+                buf.fromfile(f, block)
+            except EOFError:
+                # 마지막 block: 읽은 만큼은 buf에 들어 있다
+                yield from buf
+                return
+            yield from buf
+
+
+def _write_lines(lines, dir=None):
+    """
+    정렬된 JSON 한 줄짜리 row를 임시 파일에 기록하고 경로를 반환
+    """
+    fd, path = tempfile.mkstemp(prefix="trusguard_rows_", suffix=".jsonl", dir=dir)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+                f.write("\n")
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def _width(row):
+    # 뒤쪽 빈 칸(끝의 쉼표)은 칸으로 세지 않는다
+    width = len(row)
+    while width > 1 and not row[width - 1].strip():
+        width -= 1
+    return width
+
+
+def _distinct(keys):
+    prev = None
+    for key in keys:
+        if key != prev:
+            prev = key
+            yield key
+
+
+def format_cidr(version, network, prefix):
+    if version == 4:
+        addr = socket.inet_ntop(socket.AF_INET, network.to_bytes(4, "big"))
+        return addr if prefix == 32 else f"{addr}/{prefix}"
+    addr = str(ipaddress.IPv6Address(network))
+    return addr if prefix == 128 else f"{addr}/{prefix}"
+
+
+class Normalizer(object):
+    """
+    CSV row들을 정수 IP 범위로 모아 중복 제거 + 최소 CIDR로 병합한다.
+    IPv4는 (start << 32 | end) 한 정수로 array('Q')에 담아 메모리를 줄인다.
+    feed()로 입력을 모두 넣은 뒤 rows()로 업로드할 row를 꺼내고, report로 결과를 확인한다.
+
+    IP 칸 하나짜리 row만 병합한다. 다른 칸(설명 등)이 있는 row는 첫 칸(IP)만 검사하고,
+    같은 row 중복만 없앤 뒤 그대로 보낸다. 헤더와 모든 row는 가장 넓은 row 폭에 맞춰 빈 칸을 채운다.
+
+    IPv4 키가 memory_budget(바이트)을 넘으면 정렬해 임시 파일(run)로 내보내고, 병합할 때
+    run들을 heapq.merge로 k-way 병합하면서 중복 제거/CIDR 병합 결과도 파일로 쓴다.
+    여러 칸 row도 budget의 1/4을 넘으면 같은 방식으로 정렬된 run으로 내보낸다.
+    입력 크기와 관계없이 메모리는 budget 안에 머문다 (IPv6는 드물어 메모리에 둔다).
+    다 쓰면 close()로 임시 파일을 지운다.
+    """
+
+    def __init__(self, memory_budget=None):
+        self.memory_budget = memory_budget or DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024
+        self._run_limit = max(_MIN_BLOCK, self.memory_budget // _SORT_BYTES_PER_KEY)
+        self._runs = []
+        self._collapsed_path = None
+        self.header = None
+        self.input_rows = 0
+        self.rejected = 0
+        self.rejected_rows = []
+        self._v4 = array("Q")
+        self._v6 = []
+        self._collapsed = None
+        self.width = 1
+        # 여러 칸 row (JSON 한 줄씩), 넘치면 정렬된 run 파일로
+        self._extra = []
+        self._extra_bytes = 0
+        self._extra_runs = []
+        self._extra_path = None
+
+    def feed(self, rows, source=None):
+        for line_no, row in enumerate(rows, 1):
+            cell = row[0].strip() if row else ""
+            if not cell:
+                continue
+            self.input_rows += 1
+            parsed = parse_entry(cell)
+            if parsed is None:
+                # 첫 줄이 IP로 파싱되지 않으면 헤더로 보고 한 번만 유지
+                if line_no == 1 and is_header(row):
+                    self.input_rows -= 1
+                    if self.header is None:
+                        self.header = list(row)
+                        self.width = max(self.width, len(row))
+                    continue
+                self.rejected += 1
+                if len(self.rejected_rows) < MAX_REJECTED_SAMPLES:
+                    self.rejected_rows.append({"source": source, "line": line_no, "row": row})
+                continue
+            width = _width(row)
+            if width > 1:
+                self.width = max(self.width, width)
+                self._add_extra(json.dumps(row[:width], ensure_ascii=False))
+                continue
+            version, start, end = parsed
+            if version == 4:
+                self._v4.append(start << 32 | end)
+                if len(self._v4) >= self._run_limit:
+                    self._spill()
+            else:
+                self._v6.append((start, end))
+        self._collapsed = None
+        return self
+
+    @property
+    def accepted(self):
+        return self.input_rows - self.rejected
+
+    def _add_extra(self, line):
+        self._extra.append(line)
+        self._extra_bytes += len(line) + _ROW_OVERHEAD
+        if self._extra_bytes >= self.memory_budget // 4:
+            self._spill_extra()
+
+    def _spill_extra(self):
+        self._extra_runs.append(_write_lines(_distinct(sorted(self._extra))))
+        self._extra = []
+        self._extra_bytes = 0
+
+    def _sorted_extra(self):
+        if not self._extra_runs:
+            return sorted(self._extra)
+        if self._extra:
+            self._spill_extra()
+        return heapq.merge(*[_read_lines(path) for path in self._extra_runs])
+
+    def _spill(self):
+        # 정렬 + run 안 중복 제거 후 파일로 (이미 정렬된 입력이면 Timsort가 선형 시간)
+        self._runs.append(_write_run(_distinct(sorted(self._v4))))
+        self._v4 = array("Q")
+
+    def _block(self):
+        # run마다 읽기 버퍼 하나씩: 모두 합쳐도 budget의 절반을 넘지 않도록
+        return max(_MIN_BLOCK, self.memory_budget // (16 * (len(self._runs) + 1)))
+
+    def _sorted_v4(self):
+        if not self._runs:
+            return sorted(self._v4)
+        if self._v4:
+            self._spill()
+        block = self._block()
+        return heapq.merge(*[_read_run(path, block) for path in self._runs])
+
+    def _collapse(self):
+        if self._collapsed is None:
+            self._unique = 0
+            self._remove_collapsed()
+            v4_ranges = ((key >> 32, key & _V4_MASK) for key in self._dedup(self._sorted_v4()))
+            packed = (start << 32 | end for start, end in collapse_ranges(v4_ranges))
+            if self._runs:
+                self._collapsed_path = _write_run(packed)
+                v4 = None
+            else:
+                v4 = array("Q", packed)
+            extra = self._dedup(self._sorted_extra())
+            if self._extra_runs:
+                self._extra_path = _write_lines(extra)
+                extra = None
+            else:
+                extra = list(extra)
+            self._collapsed = {
+                4: v4,
+                6: list(collapse_ranges(self._dedup(sorted(self._v6)))),
+                "extra": extra,
+            }
+        return self._collapsed
+
+    def _dedup(self, keys):
+        prev = None
+        for key in keys:
+            if key != prev:
+                self._unique += 1
+                prev = key
+                yield key
+
+    def _v4_ranges(self):
+        collapsed = self._collapse()
+        keys = collapsed[4] if collapsed[4] is not None else _read_run(self._collapsed_path, self._block())
+        for key in keys:
+            yield key >> 32, key & _V4_MASK
+
+    def entries(self):
+        """
+        병합된 결과를 (version, network, prefix)로 반환 (IPv4 먼저, network 오름차순)
+        """
+        for start, end in self._v4_ranges():
+            for network, prefix in range_to_cidrs(start, end, 32):
+                yield 4, network, prefix
+        for start, end in self._collapse()[6]:
+            for network, prefix in range_to_cidrs(start, end, 128):
+                yield 6, network, prefix
+
+    def extra_rows(self):
+        """
+        그대로 보낼 여러 칸 row (중복 제거, 정렬된 순서)
+        """
+        collapsed = self._collapse()
+        lines = collapsed["extra"] if collapsed["extra"] is not None else _read_lines(self._extra_path)
+        for line in lines:
+            yield json.loads(line)
+
+    def cidrs(self):
+        for entry in self.entries():
+            yield format_cidr(*entry)
+
+    def rows(self, entries=None):
+        """
+        업로드할 row: 헤더, 병합된 항목(entries를 주면 그것만), 여러 칸 row 순서. 모두 같은 폭.
+        """
+        width = self.width
+        if self.header is not None:
+            yield self.header + [""] * (width - len(self.header))
+        pad = [""] * (width - 1)
+        for entry in self.entries() if entries is None else entries:
+            yield [format_cidr(*entry)] + pad
+        for row in self.extra_rows():
+            yield row + [""] * (width - len(row))
+
+    @property
+    def passthrough_rows(self):
+        collapsed = self._collapse()
+        if collapsed["extra"] is not None:
+            return len(collapsed["extra"])
+        return sum(1 for _ in _read_lines(self._extra_path))
+
+    @property
+    def output_entries(self):
+        return sum(1 for _ in self.entries())
+
+    @property
+    def report(self):
+        self._collapse()
+        return {
+            "input_rows": self.input_rows,
+            "accepted": self.accepted,
+            "duplicates": self.accepted - self._unique,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "output_entries": self.output_entries,
+            "passthrough_rows": self.passthrough_rows,
+            "spilled_runs": len(self._runs) + len(self._extra_runs),
+        }
+
+    def save_parsed(self, directory):
+        """
+        feed()한 결과를 파싱된 형태로 저장 (아티팩트 캐시용): 정렬·중복 제거된 IPv4 키 run(v4.bin)과
+        여러 칸 row(extra.jsonl), 헤더/폭/IPv6/통계(meta.json). load_parsed()로 CSV를 다시 읽지 않고 불러온다.
+        """
+        run = _write_run(_distinct(self._sorted_v4()), dir=directory)
+        os.replace(run, os.path.join(directory, "v4.bin"))
+        rows = _write_lines(_distinct(self._sorted_extra()), dir=directory)
+        os.replace(rows, os.path.join(directory, "extra.jsonl"))
+        meta = {
+            "format": PARSED_FORMAT,
+            "header": self.header,
+            "width": self.width,
+            "input_rows": self.input_rows,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "v6": self._v6,
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def load_parsed(self, directory, source=None):
+        """
+        save_parsed()로 저장한 결과를 feed()한 것처럼 더한다. IPv4 키가 budget 안에 들어가면 메모리로,
+        아니면 파일을 그대로 run으로 쓴다 (원본은 캐시 것이므로 하드링크/복사본을 run으로 둔다).
+        """
+        # 캐시 파일을 모두 읽은 뒤에 상태를 바꾼다 (중간에 실패하면 아무것도 더하지 않은 상태로 예외)
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != PARSED_FORMAT:
+            raise ValueError(f"parsed form format {meta.get('format')} is not {PARSED_FORMAT}")
+        with open(os.path.join(directory, "extra.jsonl"), encoding="utf-8") as f:
+            extra = [line.rstrip("\n") for line in f]
+        path = os.path.join(directory, "v4.bin")
+        count = os.path.getsize(path) // 8
+        keys = run = None
+        if len(self._v4) + count < self._run_limit:
+            keys = array("Q")
+            with open(path, "rb") as f:
+                keys.fromfile(f, count)
+        else:
+            fd, run = tempfile.mkstemp(prefix="trusguard_run_", suffix=".bin")
+            os.close(fd)
+            os.remove(run)
+            try:
+                os.link(path, run)
+            except OSError:
+                shutil.copyfile(path, run)
+
+        if self.header is None and meta["header"] is not None:
+            self.header = meta["header"]
+        self.width = max(self.width, meta["width"])
+        for line in extra:
+            self._add_extra(line)
+        self.input_rows += meta["input_rows"]
+        self.rejected += meta["rejected"]
+        for sample in meta["rejected_rows"][:MAX_REJECTED_SAMPLES - len(self.rejected_rows)]:
+            self.rejected_rows.append(dict(sample, source=source if source is not None else sample["source"]))
+        self._v6.extend(tuple(pair) for pair in meta["v6"])
+        if keys is not None:
+            self._v4.extend(keys)
+        else:
+            self._runs.append(run)
+        self._collapsed = None
+        return self
+
+    def _remove_collapsed(self):
+        for attr in ("_collapsed_path", "_extra_path"):
+            path = getattr(self, attr)
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                setattr(self, attr, None)
+
+    def close(self):
+        for path in self._runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._runs = []
+        for path in self._extra_runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._extra_runs = []
+        self._remove_collapsed()
+        self._collapsed = None
+
+
+def _load_cached(normalizer, directory, source):
+    try:
+        normalizer.load_parsed(directory, source)
+    except Exception as err:
+        # 캐시는 최적화일 뿐: 다른 실행이 지웠거나 형식이 다르면 CSV를 파싱한다
+        logger.warning(f"Cached parsed form for {source} is unusable, parsing the CSV: {err}")
+        return False
+    return True
+
+
+def normalize_files(paths, sources=None, remove=False, memory_budget=None, cache=None):
+    """
+    다운로드한 CSV 파일들을 Normalizer 하나로 모은다. 유효한 항목이 없으면 ConnectorError.
+    장비에 요청을 보내기 전에 호출해 잘못된 row를 미리 걸러낸다. 다 쓰면 close() 해야 한다.
+    cache(ArtifactCache)가 파싱 결과를 갖고 있는 파일은 CSV를 읽지 않고 불러온다.
+    """
+    normalizer = Normalizer(memory_budget)
+    try:
+        for i, path in enumerate(paths):
+            source = sources[i] if sources else path
+            parsed = cache.parsed(path) if cache is not None else None
+            if parsed is None or not _load_cached(normalizer, parsed, source):
+                parsed = None
+                if cache is not None and cache.can_store_parsed(path):
+                    # 처음 보는 내용(또는 쓸 수 없는 캐시): 파일 하나만 파싱해 캐시에 저장한 뒤 그 결과를 더한다
+                    part = Normalizer(memory_budget)
+                    try:
+                        part.feed(iter_csv_rows(path), source=source)
+                        parsed = cache.store_parsed(path, part.save_parsed)
+                    finally:
+                        part.close()
+                    if parsed is not None and not _load_cached(normalizer, parsed, source):
+                        parsed = None
+            if parsed is None:
+                normalizer.feed(iter_csv_rows(path, remove=remove), source=source)
+            elif remove:
+                os.remove(path)
+        if normalizer.rejected:
+            logger.warning(f"Rejected {normalizer.rejected} malformed blacklist rows: "
+                           f"{normalizer.rejected_rows[:10]}")
+        if not normalizer.accepted:
+            raise ConnectorError(f"No valid blacklist entries found: {normalizer.report}")
+    except Exception:
+        normalizer.close()
+        raise
+    return normalizer
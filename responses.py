@@ -0,0 +1,77 @@
+import json
+
+RESULT_FULL = "full"
+RESULT_COMPACT = "compact"
+
+
+def decode_response(resp):
+    """
+    응답 본문을 한 번만 파싱한다. JSON이면 파싱 결과(문자열로 한 번 더 감싼 JSON도 풀어서), 아니면 text.
+    """
+    try:
+        payload = json.loads(resp.content)
+    except ValueError:
+        return resp.text
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            pass
+    return payload
+
+
+def response_detail(resp, compact=False):
+    """
+    업로드/bulk 응답 결과. full은 기존 형태(response_code, response_text(보기 좋게), response),
+    compact는 상태 코드만 (실패한 경우에만 본문을 함께).
+    """
+    payload = decode_response(resp)
+    if compact:
+        out = {"response_code": resp.status_code}
+        if resp.status_code != 200:
+            out["response"] = payload
+        return out
+    if isinstance(payload, str):
+        return {"response_code": resp.status_code, "response_text": payload, "response": None}
+    return {
+        "response_code": resp.status_code,
+        "response_text": json.dumps(payload, ensure_ascii=False, indent=2),
+        "response": payload,
+    }
+
+
+def result_mode(value):
+    return RESULT_COMPACT if str(value or "").strip().lower() == RESULT_COMPACT else RESULT_FULL
+
+
+def compact_normalize(detail):
+    # 잘못된 row 샘플은 개수만 남긴다
+    if detail is None:
+        return None
+    return dict({k: v for k, v in detail.items() if k != "rejected_rows"},
+                rejected_samples=len(detail.get("rejected_rows") or []))
+
+
+def compact_delete(summary):
+    # 실패한 삭제는 인덱스/상태 코드/시도 횟수만
+    return {
+        "succeeded": summary["succeeded"],
+        "failed": [dict({"index": r["index"], "status_code": r["status_code"], "attempts": r["attempts"]},
+                        **({"verified": r["verified"]} if "verified" in r else {}))
+                   for r in summary["failed"]],
+        "retried": summary["retried"],
+    }
+
+
+def compact_chunks(summary):
+    if summary is None:
+        return None
+    return {
+        "chunks": summary["chunks"],
+        "committed": len(summary["committed"]),
+        "failed": [dict({"chunk": f["chunk"], "stage": f["stage"], "status_code": f["status_code"]},
+                        **({"verified": f["verified"]} if "verified" in f else {}))
+                   for f in summary["failed"]],
+        "retried": summary["retried"],
+        "skipped": len(summary.get("skipped") or []),
+    }
@@ -0,0 +1,131 @@
+from connectors.core.connector import get_logger
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import re
+import threading
+import time
+from .constants import LOGGER_NAME, SEARCH_CACHE_TTL, SEARCH_PAGE_PARAM, SEARCH_SIZE_PARAM
+from .responses import decode_response
+
+logger = get_logger(LOGGER_NAME)
+
+SEARCH_PATH = "/policy/access_block/blacklist/bulk/search"
+_DATE_RE = re.compile(r"(\d{8})")
+
+
+def date_range(end_date):
+    """
+    end_date(YYYY-MM-DD, YYMMDD, YYYYMMDD)가 속한 달의 1일 ~ end_date 를 YYYYMMDD 문자열로
+    """
+    s = str(end_date)
+    if '-' in s:
+        s = datetime.strptime(s, "%Y-%m-%d").strftime("%Y%m%d")
+    elif re.fullmatch(r"\d{6}", s):
+        s = "20" + s
+    elif not re.fullmatch(r"\d{8}", s):
+        raise ValueError(f"Invalid end_date: {s}")
+    return s[:6] + "01", s
+
+
+class BulkEntryIndex(object):
+    """
+    bulk/search 결과를 소문자 description -> file_name 날짜순 항목 목록으로 묶은 색인.
+    description 종류는 몇 개 안 되므로, 일치하는 묶음마다 날짜 범위를 bisect로 잘라낸다.
+    """
+
+    def __init__(self, entries, complete=True):
+        self.entries = entries
+        # 검색이 실패해 비어 있는 색인이면 False (항목이 없다는 뜻이 아님)
+        self.complete = complete
+        groups = {}
+        for item in entries:
+            m = _DATE_RE.search(item.get("file_name") or "")
+            if not m:
+                continue
+            desc = (item.get("description") or "").lower()
+            groups.setdefault(desc, []).append((m.group(1), item))
+        self._groups = {}
+        for desc, dated in groups.items():
+            dated.sort(key=lambda x: x[0])
+            self._groups[desc] = ([d for d, _ in dated], [item for _, item in dated])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, index):
+        for item in self.entries:
+            if str(item.get("index")) == str(index):
+                return item
+        return None
+
+    def select(self, start, end, description=""):
+        needle = (description or "").lower()
+        matched = []
+        for desc, (dates, items) in self._groups.items():
+            if needle in desc:
+                matched.extend(items[bisect_left(dates, start):bisect_right(dates, end)])
+        return matched
+
+
+def iter_search_pages(client, page_size=0):
+    """
+    bulk/search 결과를 페이지 단위로 가져온다. page_size가 0이면 한 번에 요청(기존 동작).
+    장비가 페이지 파라미터를 무시하고 같은 결과를 돌려주면 중복 페이지에서 멈춘다.
+    """
+    headers = {"Content-Type": "application/json"}
+    if not page_size:
+        resp = client.request("GET", SEARCH_PATH, headers=headers)
+        yield resp.status_code, decode_response(resp)
+        return
+    seen = set()
+    page = 1
+    while True:
+        params = {SEARCH_PAGE_PARAM: page, SEARCH_SIZE_PARAM: page_size}
+        resp = client.request("GET", SEARCH_PATH, headers=headers, params=params)
+        payload = decode_response(resp)
+        if resp.status_code != 200 or not isinstance(payload, dict):
+            yield resp.status_code, payload
+            return
+        result = payload.get("result") or []
+        fresh = [item for item in result if item.get("index") not in seen]
+        seen.update(item.get("index") for item in fresh)
+        yield resp.status_code, dict(payload, result=fresh)
+        if len(result) < page_size or len(fresh) < len(result):
+            return
+        page += 1
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def search_entries(client, page_size=0, ttl=SEARCH_CACHE_TTL):
+    """
+    장비의 bulk 항목 전체를 BulkEntryIndex로 반환. ttl초 동안은 같은 장비에 대한 결과를 재사용한다.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(client.device)
+        if cached and ttl and now - cached[0] < ttl:
+            logger.debug(f"Using cached bulk search for {client.device} ({len(cached[1])} entries)")
+            return cached[1]
+    entries = []
+    pages = 0
+    for status_code, payload in iter_search_pages(client, page_size):
+        if status_code != 200:
+            # 검색 실패 시 삭제 대상 없음으로 처리 (캐시하지 않음)
+            logger.error(f"Search failed: {payload}")
+            return BulkEntryIndex([], complete=False)
+        pages += 1
+        entries.extend(payload.get("result", []) if isinstance(payload, dict) else [])
+    index = BulkEntryIndex(entries)
+    logger.info(f"Search success: {len(entries)} bulk entries in {pages} page(s) from {client.device}")
+    with _cache_lock:
+        _cache[client.device] = (time.monotonic(), index)
+    return index
+
+
+def invalidate(device):
+    # 장비의 bulk 항목이 바뀌면(bulk 적용, 삭제) 캐시를 버린다
+    with _cache_lock:
+        _cache.pop(device, None)
@@ -0,0 +1,108 @@
+import importlib
+import importlib.machinery
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import types
+import uuid
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "withconnector_ahnlab"
+
+# 커넥터 모듈이 import 시점에 tempfile.gettempdir()로 STATE_DIR(캐시/journal)를 정하므로 먼저 바꾼다
+TEST_TMP = tempfile.mkdtemp(prefix="trusguard_tests_")
+os.environ["TMPDIR"] = TEST_TMP
+tempfile.tempdir = None
+
+# file IRI -> 로컬 파일 경로. 테스트가 artifact fixture로 채운다
+ARTIFACTS = {}
+
+
+def _install_stubs():
+    """
+    FortiSOAR 모듈 대역. connectors.core.connector는 설치돼 있지 않을 때만 대신한다.
+    download_file_from_cyops는 ARTIFACTS의 파일을 다운로드 사본으로 복사해 넘긴다.
+    """
+    try:
+        import connectors.core.connector  # noqa: F401
+    except ImportError:
+        core = types.ModuleType("connectors.core.connector")
+        core.get_logger = logging.getLogger
+        core.ConnectorError = type("ConnectorError", (Exception,), {})
+        core.Connector = object
+        for name in ("connectors", "connectors.core"):
+            sys.modules.setdefault(name, types.ModuleType(name))
+        sys.modules["connectors.core.connector"] = core
+
+    download_dir = tempfile.mkdtemp(prefix="downloads_", dir=TEST_TMP)
+
+    def download_file_from_cyops(file_iri):
+        src = ARTIFACTS[file_iri]
+        dst = tempfile.mktemp(prefix="artifact_", dir=download_dir)
+        shutil.copyfile(src, dst)
+        # 절대 경로라 커넥터가 TMP 경로와 join해도 그대로 유지된다
+        return {"cyops_file_path": dst}
+
+    builtins = types.ModuleType("connectors.cyops_utilities.builtins")
+    builtins.download_file_from_cyops = download_file_from_cyops
+    sys.modules.setdefault("connectors.cyops_utilities", types.ModuleType("connectors.cyops_utilities"))
+    sys.modules["connectors.cyops_utilities.builtins"] = builtins
+
+
+def _load_connector():
+    spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [REPO_DIR]
+    sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.builtins").supported_operations
+
+
+_install_stubs()
+OPERATIONS = _load_connector()
+
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+from mock_trusguard import MockTrusGuard  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def operations():
+    return OPERATIONS
+
+
+@pytest.fixture
+def mock():
+    server = MockTrusGuard().start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def config(mock):
+    return {"trusguardip": mock.host, "trusguardport": mock.port, "trusguardid": "test", "trusguardpassword": "test"}
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    """
+    artifact(rows) -> file IRI. rows(문자열 리스트)를 CSV로 써서 그 IRI로 내려받을 수 있게 한다.
+    artifact 캐시는 IRI 단위이므로 테스트마다 새 IRI를 쓴다 (FortiSOAR의 파일 IRI도 파일마다 다르다).
+    """
+    def register(rows):
+        iri = f"/api/3/files/{uuid.uuid4().hex}"
+        path = tmp_path / iri.rsplit("/", 1)[1]
+        path.write_text("".join(f"{row}\n" for row in rows))
+        ARTIFACTS[iri] = str(path)
+        return iri
+    yield register
+    ARTIFACTS.clear()
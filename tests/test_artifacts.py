@@ -0,0 +1,21 @@
+from withconnector_ahnlab.artifacts import artifact_cache, parse_file_iris
+
+
+def test_file_iris_accept_list_or_separated_string():
+    assert parse_file_iris(["/api/3/files/a", "/api/3/files/b"]) == ["/api/3/files/a", "/api/3/files/b"]
+    assert parse_file_iris("/api/3/files/a, /api/3/files/b\n/api/3/files/c") == \
+        ["/api/3/files/a", "/api/3/files/b", "/api/3/files/c"]
+    assert parse_file_iris(None) == []
+    assert parse_file_iris("") == []
+
+
+def test_file_iris_accept_json_array_string():
+    assert parse_file_iris('["/api/3/files/a", "/api/3/files/b"]') == ["/api/3/files/a", "/api/3/files/b"]
+    assert parse_file_iris(' [ "/api/3/files/a" ]\n') == ["/api/3/files/a"]
+
+
+def test_artifact_cache_disabled_with_zero_size():
+    assert artifact_cache({"artifactcachemb": "0"}) is None
+    cache = artifact_cache({"artifactcachemb": "2", "cacheparsed": "false"})
+    assert cache.max_bytes == 2 * 1024 * 1024
+    assert not cache.store_parsed_form
@@ -0,0 +1,79 @@
+import importlib
+
+import pytest
+import requests
+
+client_module = importlib.import_module("withconnector_ahnlab.client")
+chunked_module = importlib.import_module("withconnector_ahnlab.chunked")
+
+BULK = "/policy/access_block/blacklist/bulk"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(chunked_module, "CHUNK_RETRY_BACKOFF_SECONDS", 0)
+
+
+@pytest.fixture
+def params(artifact):
+    rows = [f"10.{i}.0.1" for i in range(30)]
+    return {"fileiri": artifact(rows), "uploaddescription": "daily", "chunkrows": "10", "chunkretries": "2",
+            "loginattempt": "1"}
+
+
+def lose_first_bulk(monkeypatch, on_lost=None):
+    """
+    첫 조각의 bulk는 장비에 반영된 뒤 응답만 잃어버린다 (ReadTimeout).
+    """
+    original = client_module.TrusGuardClient.request
+    bulks = []
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        resp = original(self, method, path, headers, timeout, **kwargs)
+        if method == "POST" and path == BULK:
+            bulks.append(resp.status_code)
+            if len(bulks) == 1:
+                if on_lost is not None:
+                    on_lost()
+                raise requests.exceptions.ReadTimeout("response lost")
+        return resp
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+    return bulks
+
+
+def test_applied_bulk_is_not_resent(operations, mock, config, params, monkeypatch):
+    bulks = lose_first_bulk(monkeypatch)
+    result = operations["upload"](config, params)
+    assert result["success"], result.get("error")
+    assert len(bulks) == 3
+    assert [entry["description"] for entry in mock.state.entries] == ["daily"] * 3
+
+
+def test_bulk_not_verified_is_reported_not_resent(operations, mock, config, params, monkeypatch):
+    def search_down():
+        mock.state.failures[f"GET {BULK}/search"] = 1.0
+
+    bulks = lose_first_bulk(monkeypatch, search_down)
+    result = operations["upload"](config, params)
+    assert not result["success"]
+    assert "unverified" in result["error"]
+    assert len(bulks) == 3
+    assert len(mock.state.entries) == 3
+
+
+def test_bulk_lost_before_apply_is_resent(operations, mock, config, params, monkeypatch):
+    original = client_module.TrusGuardClient.request
+    lost = []
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        if method == "POST" and path == BULK and not lost:
+            lost.append(path)
+            raise requests.exceptions.ReadTimeout("request lost")
+        return original(self, method, path, headers, timeout, **kwargs)
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+    result = operations["upload"](config, params)
+    assert result["success"], result.get("error")
+    assert result["chunk_detail"]["retried"] == [1]
+    assert len(mock.state.entries) == 3
@@ -0,0 +1,156 @@
+import importlib
+import time
+
+import pytest
+import requests
+
+delete_merge_module = importlib.import_module("withconnector_ahnlab.delete_merge")
+client_module = importlib.import_module("withconnector_ahnlab.client")
+
+BULK = "/policy/access_block/blacklist/bulk"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(delete_merge_module, "DELETE_BACKOFF_SECONDS", 0)
+
+
+@pytest.fixture
+def params(artifact):
+    return {"fileiris": [artifact(["1.2.3.4", "5.6.7.8"])],
+            "enddate": time.strftime("%Y%m28"), "deletedescription": "daily", "mergedescription": "merged",
+            "deleteretries": "2", "loginattempt": "1", "resultmode": "compact", "resume": "false"}
+
+
+def intercept_delete(monkeypatch, index, action):
+    """
+    index에 대한 첫 DELETE를 action(send)으로 대신한다. send()는 원래 요청을 보낸다.
+    """
+    original = client_module.TrusGuardClient.request
+    seen = []
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        send = lambda: original(self, method, path, headers, timeout, **kwargs)  # noqa: E731
+        if method == "DELETE" and kwargs.get("json", {}).get("index") == str(index) and not seen:
+            seen.append(index)
+            return action(send)
+        return send()
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+
+
+def remaining(mock):
+    return [(entry["index"], entry["description"]) for entry in mock.state.entries]
+
+
+def delete_count(mock):
+    return mock.state.snapshot()["requests"].get(f"DELETE {BULK}", 0)
+
+
+def test_timeout_before_delete_is_applied_resends(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(2, "daily")
+
+    def lost(send):
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    intercept_delete(monkeypatch, 2, lost)
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert result["deleted_response"]["delete_results"]["retried"] == [2]
+    assert sorted(result["deleted_response"]["delete_results"]["succeeded"]) == [1, 2]
+    assert [desc for _, desc in remaining(mock)] == ["merged"]
+
+
+def test_timeout_after_delete_is_applied_is_not_resent(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(2, "daily")
+
+    def applied_then_lost(send):
+        send()
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    intercept_delete(monkeypatch, 2, applied_then_lost)
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert sorted(result["deleted_response"]["delete_results"]["succeeded"]) == [1, 2]
+    assert delete_count(mock) == 2
+    assert [desc for _, desc in remaining(mock)] == ["merged"]
+
+
+def test_moved_entry_is_not_deleted_by_stale_index(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(1, "other")
+    mock.state.add_entries(1, "daily")
+    mock.state.add_entries(1, "other")
+
+    def lost_and_renumbered(send):
+        # 요청은 닿지 않았고, 그 사이 다른 작업이 앞 항목을 지워 장비가 인덱스를 당겼다
+        with mock.state.lock:
+            mock.state.entries = mock.state.entries[1:]
+            for number, entry in enumerate(mock.state.entries, 1):
+                entry["index"] = number
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    intercept_delete(monkeypatch, 2, lost_and_renumbered)
+    result = operations["delete_merge"](config, params)
+    failed = result["deleted_response"]["delete_results"]["failed"]
+    assert [(item["index"], item["verified"]) for item in failed] == [(2, "moved")]
+    # 2번은 이제 다른 항목이므로 그 번호로 다시 보내지 않는다
+    assert delete_count(mock) == 0
+    assert remaining(mock)[:2] == [(1, "daily"), (2, "other")]
+
+
+def test_failed_verification_search_stops_retry(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(1, "daily")
+
+    def lost_and_search_down(send):
+        mock.state.failures[f"GET {BULK}/search"] = 1.0
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    intercept_delete(monkeypatch, 1, lost_and_search_down)
+    result = operations["delete_merge"](config, params)
+    failed = result["deleted_response"]["delete_results"]["failed"]
+    assert [(item["index"], item["verified"]) for item in failed] == [(1, "unverified")]
+    assert delete_count(mock) == 0
+    assert (1, "daily") in remaining(mock)
+
+
+def test_entries_renumbered_after_selection_are_deleted_by_identity(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(1, "other")
+    mock.state.add_entries(2, "daily")
+    original = client_module.TrusGuardClient.request
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        resp = original(self, method, path, headers, timeout, **kwargs)
+        if method == "POST" and path == f"{BULK}/upload":
+            # 검색(파이프라인) 뒤 업로드하는 동안 다른 프로세스가 앞 항목을 지워 장비가 인덱스를 당겼다
+            with mock.state.lock:
+                mock.state.entries = mock.state.entries[1:]
+                for number, entry in enumerate(mock.state.entries, 1):
+                    entry["index"] = number
+        return resp
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+    result = operations["delete_merge"](config, dict(params, pipeline="true"))
+    assert result["success"]
+    assert sorted(result["deleted_response"]["delete_results"]["succeeded"]) == [1, 2]
+    assert [desc for _, desc in remaining(mock)] == ["merged"]
+    assert delete_count(mock) == 2
+
+
+@pytest.mark.parametrize("pipeline", ["true", "false"])
+def test_session_slot_is_free_while_merge_files_download(operations, mock, config, params, monkeypatch, pipeline):
+    mock.state.add_entries(1, "daily")
+    governor = client_module.device_governor(config)
+    original = delete_merge_module.fetch_artifacts
+    active = []
+
+    def slow_fetch(*args, **kwargs):
+        # 파이프라인이면 로그인/검색이 끝날 때까지 기다린 뒤 자리를 확인한다
+        time.sleep(0.5)
+        active.append(governor.stats["active"])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(delete_merge_module, "fetch_artifacts", slow_fetch)
+    result = operations["delete_merge"](config, dict(params, pipeline=pipeline))
+    assert result["success"]
+    assert active == [0]
+    assert [desc for _, desc in remaining(mock)] == ["merged"]
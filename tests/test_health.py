@@ -0,0 +1,34 @@
+import importlib
+
+client_module = importlib.import_module("withconnector_ahnlab.client")
+health = importlib.import_module("withconnector_ahnlab.health")
+
+SEARCH = "/policy/access_block/blacklist/bulk/search"
+
+
+def test_probe_reports_busy_without_touching_held_sessions(mock, config):
+    config = dict(config, maxsessions="1")
+    governor = client_module.device_governor(config)
+    lane = governor.acquire()
+    try:
+        result = health.probe(config)
+    finally:
+        governor.release(lane)
+    assert result["status"] == "Busy"
+    assert mock.state.snapshot()["total_requests"] == 0
+
+
+def test_probe_sends_page_params_only_when_configured(mock, config, monkeypatch):
+    original = client_module.TrusGuardClient.request
+    sent = []
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        sent.append(kwargs.get("params"))
+        return original(self, method, path, headers, timeout, **kwargs)
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+    assert health.probe(config)["status"] == "Available"
+    assert health.probe(dict(config, searchpagesize="100"))["status"] == "Available"
+    assert sent == [None, {"page": 1, "limit": 1}]
+    assert mock.state.snapshot()["requests"][f"GET {SEARCH}"] == 2
+    assert client_module.device_governor(config).stats["active"] == 0
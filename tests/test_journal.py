@@ -0,0 +1,108 @@
+import importlib
+import time
+
+import pytest
+
+client_module = importlib.import_module("withconnector_ahnlab.client")
+journal_module = importlib.import_module("withconnector_ahnlab.journal")
+
+BULK = "/policy/access_block/blacklist/bulk"
+
+
+@pytest.fixture
+def params(artifact):
+    rows = [f"10.{i}.0.1" for i in range(50)]
+    return {"fileiris": [artifact(rows)], "enddate": time.strftime("%Y%m28"),
+            "deletedescription": "daily", "mergedescription": "merged", "deleteretries": "0",
+            "loginattempt": "1", "resultmode": "compact"}
+
+
+def requests_sent(mock):
+    return mock.state.snapshot()["requests"]
+
+
+def entries(mock):
+    return [(entry["index"], entry["file_name"], entry["description"]) for entry in mock.state.entries]
+
+
+def test_resume_deletes_recorded_entries_by_identity(operations, mock, config, params):
+    mock.state.add_entries(3, "daily")
+    recorded = entries(mock)
+    mock.state.failures.update({f"DELETE {BULK}": 1.0, f"POST {BULK}": 1.0})
+    assert not operations["delete_merge"](config, params)["success"]
+    mock.state.failures.clear()
+
+    # 그 사이 장비가 인덱스를 당기고, 기록된 항목 하나는 다른 곳에서 지워지고, 기록에 없는 항목이 생겼다
+    with mock.state.lock:
+        mock.state.entries = [dict(mock.state.entries[0], file_name="blacklist_unrecorded.csv")] + \
+            mock.state.entries[1:]
+        for number, entry in enumerate(mock.state.entries, 1):
+            entry["index"] = number
+    mock.state.reset_counts()
+
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert result["journal_detail"]["resumed"]
+    assert result["journal_detail"]["vanished"] == [{"file_name": recorded[0][1], "description": "daily"}]
+    assert sorted(result["deleted_response"]["delete_results"]["succeeded"]) == [2, 3]
+    assert [(name, desc) for _, name, desc in entries(mock)] == \
+        [("blacklist_unrecorded.csv", "daily"), (entries(mock)[-1][1], "merged")]
+
+
+def test_resume_skips_entries_deleted_by_the_failed_run(operations, mock, config, params):
+    mock.state.add_entries(2, "daily")
+    mock.state.failures[f"POST {BULK}"] = 1.0
+    assert not operations["delete_merge"](config, params)["success"]
+    mock.state.failures.clear()
+    mock.state.reset_counts()
+
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert len(result["journal_detail"]["previously_deleted"]) == 2
+    assert f"DELETE {BULK}" not in requests_sent(mock)
+    assert [desc for _, _, desc in entries(mock)] == ["merged"]
+
+
+def test_resume_skips_committed_chunks(operations, mock, config, params, monkeypatch):
+    params.update(chunkrows="10", chunkretries="0")
+    original = client_module.TrusGuardClient.request
+    bulks = []
+
+    def request(self, method, path, headers=None, timeout=None, **kwargs):
+        if method == "POST" and path == BULK:
+            bulks.append(path)
+            if len(bulks) == 2:
+                mock.state.failures[f"POST {BULK}"] = 1.0
+        return original(self, method, path, headers, timeout, **kwargs)
+
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", request)
+    assert not operations["delete_merge"](config, params)["success"]
+    monkeypatch.setattr(client_module.TrusGuardClient, "request", original)
+    mock.state.failures.clear()
+    mock.state.reset_counts()
+
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert result["journal_detail"]["skipped_chunks"] == [1]
+    assert requests_sent(mock)[f"POST {BULK}/upload"] == 4
+    assert [desc for _, _, desc in entries(mock)] == ["merged"] * 5
+
+
+def test_resume_skips_applied_bulk(operations, mock, config, params, monkeypatch):
+    mock.state.add_entries(1, "daily")
+    original = journal_module.RunJournal.clear
+
+    def crash(self):
+        raise RuntimeError("worker died after bulk")
+
+    monkeypatch.setattr(journal_module.RunJournal, "clear", crash)
+    assert not operations["delete_merge"](config, params)["success"]
+    monkeypatch.setattr(journal_module.RunJournal, "clear", original)
+    mock.state.reset_counts()
+
+    result = operations["delete_merge"](config, params)
+    assert result["success"]
+    assert result["journal_detail"]["bulk_skipped"]
+    assert f"POST {BULK}" not in requests_sent(mock)
+    assert f"POST {BULK}/upload" not in requests_sent(mock)
+    assert [desc for _, _, desc in entries(mock)] == ["merged"]
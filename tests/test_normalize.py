@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from withconnector_ahnlab.chunked import spool_chunks
+from withconnector_ahnlab.normalize import Normalizer
+
+
+def normalized_rows(rows, memory_budget=None):
+    normalizer = Normalizer(memory_budget).feed(rows)
+    try:
+        return list(normalizer.rows()), normalizer.report
+    finally:
+        normalizer.close()
+
+
+def test_single_column_rows_are_collapsed_under_header():
+    rows, report = normalized_rows([["ip"], ["1.2.3.4"], ["1.2.3.5"], ["1.2.3.4"]])
+    assert rows == [["ip"], ["1.2.3.4/31"]]
+    assert report["duplicates"] == 1
+    assert report["passthrough_rows"] == 0
+
+
+def test_multi_column_rows_keep_their_columns():
+    rows, report = normalized_rows([["ip", "desc"], ["1.2.3.4", "foo"]])
+    assert rows == [["ip", "desc"], ["1.2.3.4", "foo"]]
+    assert report["passthrough_rows"] == 1
+
+
+def test_mixed_widths_are_padded_to_the_header():
+    rows, report = normalized_rows([["ip", "desc"], ["1.2.3.4", "foo"], ["1.2.3.4", "foo"],
+                                    ["10.0.0.1"], ["10.0.0.2", ""]])
+    assert rows == [["ip", "desc"], ["10.0.0.1", ""], ["10.0.0.2", ""], ["1.2.3.4", "foo"]]
+    assert {len(row) for row in rows} == {2}
+    assert report["duplicates"] == 1
+
+
+def test_multi_column_rows_without_header_widen_all_rows():
+    rows, _ = normalized_rows([["1.2.3.4"], ["5.6.7.8", "foo", "bar"]])
+    assert rows == [["1.2.3.4", "", ""], ["5.6.7.8", "foo", "bar"]]
+
+
+def test_invalid_ip_in_multi_column_row_is_rejected():
+    rows, report = normalized_rows([["ip", "desc"], ["1.2.3.4", "ok"], ["not-an-ip", "bad"]])
+    assert rows == [["ip", "desc"], ["1.2.3.4", "ok"]]
+    assert report["rejected"] == 1
+
+
+def test_spilled_multi_column_rows_match_in_memory_result():
+    data = [["ip", "desc"]] + [[f"10.0.{i % 7}.{i % 50}", f"row {i % 50}"] for i in range(400)]
+    assert normalized_rows(data, memory_budget=1024)[0] == normalized_rows(data)[0]
+
+
+def test_parsed_form_round_trip_keeps_columns():
+    data = [["ip", "desc"], ["1.2.3.4", "foo"], ["1.2.3.5"]]
+    expected, _ = normalized_rows(data)
+    directory = tempfile.mkdtemp()
+    source = Normalizer().feed(data)
+    source.save_parsed(directory)
+    source.close()
+    loaded = Normalizer().load_parsed(directory)
+    try:
+        assert list(loaded.rows()) == expected
+    finally:
+        loaded.close()
+
+
+def test_header_with_digits_is_kept():
+    for header in ("IPv4", "ip_v4"):
+        rows, report = normalized_rows([[header], ["1.2.3.4"], ["1.2.3.5"]])
+        assert rows == [[header], ["1.2.3.4/31"]]
+        assert report["rejected"] == 0
+
+
+def test_chunks_repeat_header_with_digits():
+    paths = list(spool_chunks([["IPv4"], ["1.2.3.4"], ["5.6.7.8"]], max_rows=1))
+    try:
+        assert [open(path).read().splitlines() for path in paths] == [["IPv4", "1.2.3.4"], ["IPv4", "5.6.7.8"]]
+    finally:
+        for path in paths:
+            os.remove(path)
@@ -0,0 +1,48 @@
+import importlib
+import time
+
+client_module = importlib.import_module("withconnector_ahnlab.client")
+
+BULK = "/policy/access_block/blacklist/bulk"
+
+
+def test_token_expiring_between_upload_and_bulk_uploads_again(operations, mock, config, artifact, monkeypatch):
+    # 삭제하는 동안 토큰이 만료되어 재로그인하면, 업로드한 파일은 이전 세션에 남아 있다
+    monkeypatch.setattr(client_module, "TOKEN_TTL_SECONDS", 0.5)
+    mock.state.latency = 0.15
+    mock.state.add_entries(3, "daily")
+    params = {"fileiris": [artifact(["1.2.3.4", "5.6.7.8"])], "enddate": time.strftime("%Y%m28"),
+              "deletedescription": "daily", "mergedescription": "merged", "loginattempt": "1",
+              "resultmode": "compact", "pipeline": "false"}
+    result = operations["delete_merge"](config, params)
+    assert result["success"], result.get("error")
+    assert mock.state.snapshot()["requests"][f"POST {BULK}/upload"] == 2
+    assert [entry["description"] for entry in mock.state.entries] == ["merged"]
+
+
+def test_token_rejected_on_bulk_uploads_again(operations, mock, config, artifact):
+    # 장비가 업로드 직후 세션을 끊으면 bulk는 거부되고, 새 세션에 다시 올린 뒤 반영한다
+    staged = mock.state.staged = _ExpireOnStage(mock.state)
+    params = {"fileiri": artifact(["1.2.3.4"]), "uploaddescription": "daily", "loginattempt": "1"}
+    result = operations["upload"](config, params)
+    assert result["success"], result.get("error")
+    assert staged.expired == 1
+    assert mock.state.snapshot()["requests"][f"POST {BULK}/upload"] == 2
+    assert [entry["description"] for entry in mock.state.entries] == ["daily"]
+
+
+class _ExpireOnStage(dict):
+    """
+    mock의 staged(token -> rows). 처음 파일이 올라오면 그 세션의 토큰을 무효화한다.
+    """
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+        self.expired = 0
+
+    def __setitem__(self, token, rows):
+        super().__setitem__(token, rows)
+        if not self.expired:
+            self.expired += 1
+            self.state.tokens.pop(token, None)
@@ -0,0 +1,22 @@
+import importlib
+
+upload_batch_module = importlib.import_module("withconnector_ahnlab.upload_batch")
+
+
+def test_memory_budget_is_split_across_batches(operations, mock, config, artifact, monkeypatch):
+    # 배치마다 만든 Normalizer가 끝까지 같이 살아 있으므로, 합쳐서 memorybudgetmb를 넘지 않아야 한다
+    original = upload_batch_module.normalize_files
+    budgets = []
+
+    def normalize_files(paths, memory_budget=None, **kwargs):
+        budgets.append(memory_budget)
+        return original(paths, memory_budget=memory_budget, **kwargs)
+
+    monkeypatch.setattr(upload_batch_module, "normalize_files", normalize_files)
+    iris = [artifact([f"10.0.{i}.1"]) for i in range(3)]
+    params = {"fileiris": ",".join(iris), "batchsize": "1", "memorybudgetmb": "3", "uploaddescription": "daily",
+              "loginattempt": "1"}
+    result = operations["upload_batch"](config, params)
+    assert result["success"], result.get("error")
+    assert budgets == [1024 * 1024] * 3
+    assert len(mock.state.entries) == 3
@@ -1,200 +1,208 @@
 from connectors.core.connector import get_logger, ConnectorError
-from connectors.cyops_utilities.builtins import download_file_from_cyops
-import requests
-import urllib3
+from array import array
 import os
-import csv
-import time
-import json
-from datetime import datetime
+from .applied import AppliedIndex
+from .artifacts import artifact_cache, fetch_artifact
+from .chunked import ChunkedUpload
+from .client import get_client, device_name, device_governor, StagedUpload
+from .constants import (DEFAULT_CHUNK_ROWS, DEFAULT_CHUNK_BYTES, DEFAULT_CHUNK_WORKERS, DEFAULT_CHUNK_RETRIES,
+                        DEFAULT_TARGET_WORKERS, DEFAULT_MEMORY_BUDGET_MB, UPLOAD_FILE_NAME)
+from .fanout import target_configs, run_targets, combine_results
+from .metrics import RunMetrics
+from .multipart import multipart_body
+from .normalize import normalize_files
+from .responses import response_detail, result_mode, compact_normalize, compact_chunks, RESULT_COMPACT
+from .search import invalidate as invalidate_search
+from .utils import to_int, to_bool, iter_csv_rows
 
 logger = get_logger('trusguard-bulk-upload')
-TMP_PATH = '/tmp/'
 
 def upload(config, params):
     """
     TrusGuard 방화벽 블랙리스트 파일 업로드 (파일만! raw 미지원)
     params['file_iri']가 반드시 있어야 하며, 없으면 예외 발생.
+    params['targets']로 여러 장비를 주면 한 번 내려받고 정규화한 결과를 모든 장비에 동시에 올린다.
     """
-    trusguardip = config.get("trusguardip")
-    trusguardport = config.get("trusguardport")
-    BASE_URL = f"https://{trusguardip}:{trusguardport}"
-    TIMEOUT = 30
-    VERIFY_SSL = False
-    ID = config.get("trusguardid")
-    PASSWORD = config.get("trusguardpassword")
-    INTERVAL_SECONDS = 600
-    
+    TARGETS = target_configs(config, params.get("targets"))
+    TARGET_WORKERS = to_int(params.get("targetworkers"), DEFAULT_TARGET_WORKERS)
+    # 장비별 실행 기록, 다운로드/정규화는 shared에 기록한 뒤 장비마다 더한다
+    shared = RunMetrics("upload", device_name(TARGETS[0]))
+    run_metrics = {device_name(target): RunMetrics("upload", device_name(target)) for target in TARGETS}
+
     DESCRIPTION = params.get("uploaddescription", "")
                                         
     LOGIN_ATTEMPT = params.get("loginattempt")
-    
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-
-    def format_response_text(text):
-        try:
-            intermediate = json.loads(text)
-            if isinstance(intermediate, str):
-                parsed = json.loads(intermediate)
-            else:
-                parsed = intermediate
-            pretty = json.dumps(parsed, ensure_ascii=False, indent=2)
-            return pretty
-        except Exception:
-            return text
-
-    def alert(stage, last_result):
-        stage_repr = "Warning" if stage == 3 else "Retry" if stage < 5 else "Critical"
-        logger.error(f"[Auth Retry {stage_repr}] {stage} consecutive failures: {last_result}")
-
-    def authenticate():
-        token_url = f"{BASE_URL}/token"
-        login_url = f"{BASE_URL}/login"
-        payload = {"id": ID, "password": PASSWORD}
-        last_result = None
-
-        # 기본값 5, 숫자가 아니거나 None일 경우 fallback
-        max_attempt = int(LOGIN_ATTEMPT) if LOGIN_ATTEMPT and str(LOGIN_ATTEMPT).isdigit() else 5
+    LOGIN_RETRY_MAX_DELAY = params.get("loginretrymaxdelay")
+    NORMALIZE = to_bool(params.get("normalize"), True)
+    # 증분 모드는 정규화된 항목 단위로 비교하므로 정규화를 함께 켠다
+    INCREMENTAL = to_bool(params.get("incremental"), False)
+    # chunkrows/chunkbytes 중 하나라도 주면 조각 단위로 upload -> bulk
+    CHUNK_ROWS = to_int(params.get("chunkrows"), DEFAULT_CHUNK_ROWS, minimum=0)
+    CHUNK_BYTES = to_int(params.get("chunkbytes"), DEFAULT_CHUNK_BYTES, minimum=0)
+    CHUNK_WORKERS = to_int(params.get("chunkworkers"), DEFAULT_CHUNK_WORKERS)
+    CHUNK_RETRIES = to_int(params.get("chunkretries"), DEFAULT_CHUNK_RETRIES, minimum=0)
+    MEMORY_BUDGET_MB = to_int(params.get("memorybudgetmb"), DEFAULT_MEMORY_BUDGET_MB)
+    # 같은 첨부파일을 다시 올릴 때(다른 장비, 재실행) 다운로드/파싱을 건너뛴다
+    cache = artifact_cache(params)
+    # compact: 응답 본문 대신 상태 코드/개수 요약만 결과에 남긴다 (FortiSOAR step 결과 크기 절감)
+    COMPACT = result_mode(params.get("resultmode")) == RESULT_COMPACT
 
-        for attempt in range(1, max_attempt + 1):
-            try:
-                resp = requests.post(token_url, json=payload, verify=VERIFY_SSL, timeout=TIMEOUT)
-                token_json = resp.json() if resp.headers.get('content-type', '').startswith('application/json') else None
-                token = token_json.get("token") if resp.status_code == 200 and token_json else None
-            except Exception as e:
-                token = None
-                token_json = {"error": str(e)}
-                resp = None
-
-            if token:
-                headers = {"key": "Authorization", "Authorization": token}
-                try:
-                    resp2 = requests.post(login_url, headers=headers, verify=VERIFY_SSL, timeout=TIMEOUT)
-                    login_json = resp2.json() if resp2.headers.get('content-type', '').startswith('application/json') else None
-                    login_detail = {
-                        "status_code": resp2.status_code,
-                        "response": login_json if resp2.status_code == 200 else resp2.text
-                    }
-                    if resp2.status_code == 200:
-                        return token, login_json
-                    else:
-                        last_result = {
-                            "stage": "login",
-                            "attempt": attempt,
-                            "resp_json": login_json,
-                            "code": resp2.status_code
-                        }
-                except Exception as e:
-                    last_result = {
-                        "stage": "login_exception",
-                        "attempt": attempt,
-                        "error": str(e)
-                    }
-            else:
-                last_result = {
-                    "stage": "get_token",
-                    "attempt": attempt,
-                    "resp_json": token_json,
-                    "code": getattr(resp, "status_code", None)
-                }
-            if attempt < max_attempt:
-                time.sleep(INTERVAL_SECONDS)
-        raise ConnectorError(f"Login failed after {max_attempt} attempts, {login_json}")
-        
     def get_file_content():
         """
-        file_iri 반드시 필요
+        file_iri 반드시 필요. 다운로드된 파일 경로만 반환 (row를 메모리에 올리지 않음)
         """
         file_iri = params.get('fileiri')
         if not file_iri:
             logger.error("No file_iri provided in params; file is required.")
             raise ConnectorError("No file_iri provided in params; artifact file must be specified.")
-        try:
-            dw_file_md = download_file_from_cyops(file_iri)
-            file_path = os.path.join(TMP_PATH, dw_file_md['cyops_file_path'])
-            with open(file_path, encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            return rows
-        except Exception as err:
-            logger.error(f"Failed to download or read artifact file: {err}")
-            raise ConnectorError(f"Failed to download or read artifact file: {err}")
+        return fetch_artifact(file_iri, cache)
 
-    def upload_file(token, rows):
-        
-        csv_path = os.path.join(TMP_PATH, "blacklist.csv")
+    def upload_file(client, metrics, source):
+        # 파일 경로 또는 정규화된 row를 만드는 함수를 임시 사본 없이 그대로 multipart 본문으로 스트리밍
+        body, content_type = multipart_body("blacklist_csv", UPLOAD_FILE_NAME, source)
+        headers = {"key": "Authorization", "Content-Type": content_type}
+        metrics.add("upload", nbytes=len(body))
         try:
-            with open(csv_path, "w", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
-            url = f"{BASE_URL}/policy/access_block/blacklist/bulk/upload"
-            headers = {"key": "Authorization", "Authorization": token}
-            with open(csv_path, "rb") as f:
-                files = {"blacklist_csv": (csv_path, f, "text/csv")}
-                resp = requests.post(url, headers=headers, files=files, timeout=TIMEOUT, verify=VERIFY_SSL)
-                resp_text_raw = resp.text
-                resp_text_pretty = format_response_text(resp_text_raw)
-            out = {"response_code": resp.status_code, "response_text": resp_text_pretty}
-            try:
-                out["response"] = resp.json()
-            except Exception:
-                out["response"] = None
-            return resp.status_code == 200, out
+            with metrics.phase("upload"):
+                resp = client.request("POST", "/policy/access_block/blacklist/bulk/upload",
+                                      headers=headers, data=body)
         finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+            body.close()
+        return resp.status_code == 200, response_detail(resp, COMPACT)
 
-    def bulk(token):
-        url = f"{BASE_URL}/policy/access_block/blacklist/bulk"
-        headers = {"Content-Type": "application/json", "Authorization": token}
+    def bulk(client, staged):
+        headers = {"Content-Type": "application/json"}
         payload = {"description": DESCRIPTION, "expire_enable": "0"}
-        resp = requests.post(url, json=payload, headers=headers, timeout=TIMEOUT, verify=VERIFY_SSL)
-        resp_text_raw = resp.text
-        resp_text_pretty = format_response_text(resp_text_raw)        
-        out = {"response_code": resp.status_code, "response_text": resp_text_pretty}
+        resp = staged.bulk(lambda token: client.request("POST", "/policy/access_block/blacklist/bulk", json=payload,
+                                                        headers=headers, token=token))
+        return response_detail(resp, COMPACT)
+
+    def prepare():
+        """
+        다운로드와 정규화는 장비 수와 관계없이 한 번만. (파일 경로, Normalizer, 정규화 결과) 반환
+        """
+        with shared.phase("download"):
+            file_path = get_file_content()
+        shared.add("download", nbytes=os.path.getsize(file_path))
+        normalizer = normalize_detail = None
+        if NORMALIZE or INCREMENTAL:
+            # 장비에 보내기 전에 중복 제거/CIDR 병합, 잘못된 row는 결과에 보고
+            with shared.phase("parse"):
+                normalizer = normalize_files([file_path], sources=[params.get('fileiri')],
+                                             memory_budget=MEMORY_BUDGET_MB * 1024 * 1024, cache=cache)
+                normalize_detail = normalizer.report
+            shared.add("parse", rows=normalizer.input_rows)
+        return file_path, normalizer, normalize_detail
+
+    def push(target, file_path, normalizer, normalize_detail):
+        """
+        장비 하나에 업로드 -> bulk.
+        """
+        metrics = run_metrics[device_name(target)]
+        metrics.merge(shared)
+        # 같은 장비에 동시에 도는 작업 수 제한: 받은 자리 번호의 세션(lane)을 쓰고, 자리가 없으면 차례를 기다린다
+        governor = device_governor(target)
         try:
-            out["response"] = resp.json()
-        except Exception:
-            out["response"] = None
-        return out
-    def logout(token):
-        logout_url = f"{BASE_URL}/logout"
-        headers = {"Authorization": token}
+            with metrics.phase("queue"):
+                lane = governor.acquire()
+        except ConnectorError as err:
+            logger.error(f"Upload to {device_name(target)} failed: {err}")
+            return {"success": False, "error": str(err), "metrics": metrics.finish(False)}
+        # 세션/토큰은 get_client()가 실행 간에 재사용하므로 여기서 logout 하지 않는다
+        client = metrics.instrument(get_client(target, lane))
         try:
-            response = requests.post(logout_url, headers=headers, verify=VERIFY_SSL, timeout=5)
-            if response.status_code == 200:
-                payload = response.json() if response.headers.get("content-type","").startswith("application/json") else response.text
-                result = {"response_code": response.status_code, "response": payload}
+            delta_detail = applied = None
+            source = normalizer.rows if normalizer is not None else file_path
+            if INCREMENTAL:
+                # 이 장비에 이미 반영한 항목은 건너뛰고 새 항목만 업로드.
+                # 여러 칸 row는 병합하지 않으므로 색인에 없고 매번 그대로 보낸다
+                applied = AppliedIndex(client.device, client.username)
+                new_count = applied.count_new(normalizer.entries())
+                delta_detail = {"new": new_count, "known": normalize_detail["output_entries"] - new_count,
+                                "passthrough": normalize_detail["passthrough_rows"]}
+                if not new_count and not normalize_detail["passthrough_rows"]:
+                    logger.info(f"No new blacklist entries for {client.device}; skipping upload")
+                    return {
+                        "success": True,
+                        "delta_detail": delta_detail,
+                        "upload_detail": None,
+                        "bulk_detail": None,
+                        "metrics": metrics.finish(True)
+                    }
+                new_keys = array("Q")
+
+                def source():
+                    # 본문 길이 계산/재전송 때마다 다시 불리므로 모은 키를 비우고 시작
+                    del new_keys[:]
+                    return normalizer.rows(applied.filter_new(normalizer.entries(), new_keys))
+            token, login_detail = client.authenticate(LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY)
+            up_detail = bulk_out = chunk_detail = None
+            if CHUNK_ROWS or CHUNK_BYTES:
+                uploader = ChunkedUpload(target, metrics, DESCRIPTION, CHUNK_WORKERS, CHUNK_RETRIES,
+                                         LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY, lane)
+                with metrics.phase("upload"):
+                    chunk_detail = uploader.run(iter_csv_rows(source) if isinstance(source, str) else source(),
+                                                CHUNK_ROWS, CHUNK_BYTES)
+                if chunk_detail["committed"]:
+                    invalidate_search(client.device)
+                if chunk_detail["failed"]:
+                    raise ConnectorError(f"Chunked upload failed: {chunk_detail}")
             else:
-                result = {"response_code": response.status_code, "response": response.text}
-        except requests.exceptions.RequestException as e:
-            result = {"response_code": None, "response": str(e)}
-        return result  
+                staged = StagedUpload(client, lambda: upload_file(client, metrics, source), LOGIN_ATTEMPT,
+                                      LOGIN_RETRY_MAX_DELAY)
+                up_ok, up_detail = staged.upload()
+                if not up_ok:
+                    raise ConnectorError(f"File upload failed: {up_detail}")
+                with metrics.phase("bulk"):
+                    bulk_out = bulk(client, staged)
+                invalidate_search(client.device)
+                if bulk_out.get("response_code") != 200:
+                    raise ConnectorError(f"Bulk apply failed: {bulk_out}")
+            if applied is not None:
+                delta_detail["index_size"] = applied.add(new_keys)
+
+            return {
+                "success": True,
+                "login_detail": None if COMPACT else login_detail,
+                "delta_detail": delta_detail,
+                "upload_detail": up_detail,
+                "bulk_detail": bulk_out,
+                "chunk_detail": compact_chunks(chunk_detail) if COMPACT else chunk_detail,
+                "metrics": metrics.finish(True)
+            }
+        except Exception as err:
+            logger.error(f"Upload to {client.device} failed: {err}")
+            return {
+                "success": False,
+                "error": str(err),
+                "metrics": metrics.finish(False)
+            }
+        finally:
+            governor.release(lane)
 
-  
     try:
-        token, login_detail = authenticate()
-        rows = get_file_content()
-        up_ok, up_detail = upload_file(token, rows)
-        if not up_ok:
-            raise ConnectorError(f"File upload failed: {up_detail}")
-        bulk_out = bulk(token)
-        if bulk_out.get("response_code") != 200:
-            raise ConnectorError(f"Bulk apply failed: {bulk_out}")
-        
-        logout_result = logout(token) if token else None
-        
-        return {
-            "success": True,
-            "login_detail": login_detail,
-            "upload_detail": up_detail,
-            "bulk_detail": bulk_out,
-            "logout_detail": logout_result
-        }
+        file_path, normalizer, normalize_detail = prepare()
     except Exception as err:
         logger.error("Upload failed: {}".format(str(err)))
-        return {
-            "success": False,
-            "error": str(err)
-        }
+        results = []
+        for target in TARGETS:
+            metrics = run_metrics[device_name(target)]
+            metrics.merge(shared)
+            results.append({"success": False, "error": str(err), "metrics": metrics.finish(False)})
+        return combine_results(TARGETS, results)
+
+    try:
+        results = run_targets(TARGETS, lambda target: push(target, file_path, normalizer, normalize_detail),
+                              TARGET_WORKERS)
+    finally:
+        if normalizer is not None:
+            normalizer.close()
+        # 캐시에 사본이 있으므로 내려받은 작업 파일은 남기지 않는다
+        if cache is not None:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+    return combine_results(TARGETS, results,
+                           normalize_detail=compact_normalize(normalize_detail) if COMPACT else normalize_detail,
+                           cache_detail=cache.stats if cache is not None else None)
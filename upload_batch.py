@@ -0,0 +1,160 @@
+from connectors.core.connector import get_logger, ConnectorError
+import itertools
+import os
+from .artifacts import artifact_cache, parse_file_iris, fetch_artifacts, remove_files
+from .client import get_client, device_name, device_governor, StagedUpload
+from .constants import (DEFAULT_DOWNLOAD_WORKERS, DEFAULT_BATCH_SIZE, DEFAULT_TARGET_WORKERS,
+                        DEFAULT_MEMORY_BUDGET_MB, UPLOAD_FILE_NAME)
+from .fanout import target_configs, run_targets, combine_results
+from .metrics import RunMetrics
+from .multipart import multipart_body
+from .normalize import normalize_files
+from .responses import response_detail, result_mode, compact_normalize, RESULT_COMPACT
+from .search import invalidate as invalidate_search
+from .utils import to_int, to_bool, iter_csv_rows
+
+logger = get_logger('trusguard-bulk-upload')
+
+
+def upload_batch(config, params):
+    """
+    여러 첨부파일을 한 세션에서 올리고 배치마다 bulk를 한 번만 호출한다.
+    batchsize개 파일씩 묶어 (정규화하면 묶음 안의 중복/인접 대역까지 합쳐) 업로드 1번 + bulk 1번.
+    batchsize가 0이면 전체를 한 배치로 반영한다.
+    """
+    TARGETS = target_configs(config, params.get("targets"))
+    TARGET_WORKERS = to_int(params.get("targetworkers"), DEFAULT_TARGET_WORKERS)
+    shared = RunMetrics("upload_batch", device_name(TARGETS[0]))
+    run_metrics = {device_name(target): RunMetrics("upload_batch", device_name(target)) for target in TARGETS}
+
+    DESCRIPTION = params.get("uploaddescription", "")
+    FILE_IRIS = parse_file_iris(params.get("fileiris"))
+    BATCH_SIZE = to_int(params.get("batchsize"), DEFAULT_BATCH_SIZE, minimum=0)
+    LOGIN_ATTEMPT = params.get("loginattempt")
+    LOGIN_RETRY_MAX_DELAY = params.get("loginretrymaxdelay")
+    DOWNLOAD_WORKERS = to_int(params.get("downloadworkers"), DEFAULT_DOWNLOAD_WORKERS)
+    NORMALIZE = to_bool(params.get("normalize"), True)
+    MEMORY_BUDGET_MB = to_int(params.get("memorybudgetmb"), DEFAULT_MEMORY_BUDGET_MB)
+    cache = artifact_cache(params)
+    COMPACT = result_mode(params.get("resultmode")) == RESULT_COMPACT
+
+    if not FILE_IRIS:
+        raise ConnectorError("Parameter 'file_iris' list is required.")
+
+    def prepare():
+        """
+        모든 파일을 내려받아 배치로 나눈다. 배치마다 {files, rows(), normalize_detail}.
+        정규화하면 파일은 바로 지우고 Normalizer는 모든 장비에 반영한 뒤 cleanup에서 닫는다.
+        """
+        with shared.phase("download"):
+            paths = fetch_artifacts(FILE_IRIS, DOWNLOAD_WORKERS, cache)
+        downloaded.extend(paths)
+        shared.add("download", nbytes=sum(os.path.getsize(path) for path in paths))
+        size = BATCH_SIZE or len(paths)
+        # 모든 배치의 Normalizer가 모든 장비에 반영할 때까지 같이 살아 있으므로 memorybudgetmb를 배치 수로 나눈다
+        # (배치마다 장비 세션을 잡은 채로 정규화하지 않도록 미리 만들어 둔다)
+        budget = max(1, MEMORY_BUDGET_MB * 1024 * 1024 // len(range(0, len(paths), size)))
+        batches = []
+        for start in range(0, len(paths), size):
+            batch_paths, batch_iris = paths[start:start + size], FILE_IRIS[start:start + size]
+            if not NORMALIZE:
+                batches.append({"files": batch_iris, "normalize_detail": None,
+                                "rows": lambda batch_paths=batch_paths: itertools.chain.from_iterable(
+                                    iter_csv_rows(path) for path in batch_paths)})
+                continue
+            with shared.phase("parse"):
+                normalizer = normalize_files(batch_paths, sources=batch_iris, remove=True,
+                                             memory_budget=budget, cache=cache)
+            cleanup.append(normalizer.close)
+            shared.add("parse", rows=normalizer.input_rows)
+            batches.append({"files": batch_iris, "normalize_detail": normalizer.report, "rows": normalizer.rows})
+        return batches
+
+    def upload_rows(client, metrics, rows):
+        body, content_type = multipart_body("blacklist_csv", UPLOAD_FILE_NAME, rows)
+        headers = {"key": "Authorization", "Content-Type": content_type}
+        metrics.add("upload", nbytes=len(body))
+        try:
+            with metrics.phase("upload"):
+                resp = client.request("POST", "/policy/access_block/blacklist/bulk/upload", headers=headers,
+                                      data=body)
+        finally:
+            body.close()
+        return resp.status_code == 200, response_detail(resp, COMPACT)
+
+    def bulk(client, staged):
+        headers = {"Content-Type": "application/json"}
+        payload = {"description": DESCRIPTION, "expire_enable": "0"}
+        resp = staged.bulk(lambda token: client.request("POST", "/policy/access_block/blacklist/bulk", json=payload,
+                                                        headers=headers, token=token))
+        return response_detail(resp, COMPACT)
+
+    def push(target, batches):
+        """
+        장비 하나에 로그인 한 번으로 배치마다 업로드 -> bulk. 배치가 실패하면 남은 배치는 보내지 않는다.
+        """
+        metrics = run_metrics[device_name(target)]
+        metrics.merge(shared)
+        governor = device_governor(target)
+        try:
+            with metrics.phase("queue"):
+                lane = governor.acquire()
+        except ConnectorError as err:
+            logger.error(f"Batch upload to {device_name(target)} failed: {err}")
+            return {"success": False, "error": str(err), "metrics": metrics.finish(False)}
+        client = metrics.instrument(get_client(target, lane))
+        batch_details = []
+        try:
+            _, login_detail = client.authenticate(LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY)
+            for number, batch in enumerate(batches, 1):
+                detail = {"batch": number, "files": len(batch["files"]) if COMPACT else batch["files"]}
+                batch_details.append(detail)
+                staged = StagedUpload(client, lambda rows=batch["rows"]: upload_rows(client, metrics, rows),
+                                      LOGIN_ATTEMPT, LOGIN_RETRY_MAX_DELAY)
+                up_ok, detail["upload_detail"] = staged.upload()
+                if not up_ok:
+                    raise ConnectorError(f"File upload failed for batch {number}: {detail['upload_detail']}")
+                with metrics.phase("bulk"):
+                    detail["bulk_detail"] = bulk(client, staged)
+                invalidate_search(client.device)
+                if detail["bulk_detail"].get("response_code") != 200:
+                    raise ConnectorError(f"Bulk apply failed for batch {number}: {detail['bulk_detail']}")
+            return {
+                "success": True,
+                "login_detail": None if COMPACT else login_detail,
+                "batches": batch_details,
+                "metrics": metrics.finish(True)
+            }
+        except Exception as err:
+            logger.error(f"Batch upload to {client.device} failed: {err}")
+            return {
+                "success": False,
+                "error": str(err),
+                "batches": batch_details,
+                "metrics": metrics.finish(False)
+            }
+        finally:
+            governor.release(lane)
+
+    downloaded, cleanup = [], []
+    try:
+        try:
+            batches = prepare()
+        except Exception as err:
+            logger.error("Batch upload failed: {}".format(str(err)))
+            results = []
+            for target in TARGETS:
+                metrics = run_metrics[device_name(target)]
+                metrics.merge(shared)
+                results.append({"success": False, "error": str(err), "metrics": metrics.finish(False)})
+            return combine_results(TARGETS, results)
+        results = run_targets(TARGETS, lambda target: push(target, batches), TARGET_WORKERS)
+    finally:
+        remove_files(downloaded)
+        for close in cleanup:
+            close()
+    normalize_detail = [dict(batch=number, **(compact_normalize(batch["normalize_detail"])
+                                              if COMPACT else batch["normalize_detail"]))
+                        for number, batch in enumerate(batches, 1) if batch["normalize_detail"] is not None]
+    return combine_results(TARGETS, results, batch_count=len(batches), normalize_detail=normalize_detail or None,
+                           cache_detail=cache.stats if cache is not None else None)
@@ -0,0 +1,37 @@
+import csv
+import os
+
+
+def to_int(value, default, minimum=1):
+    """
+    플레이북 파라미터(문자열일 수 있음)를 정수로 변환. 숫자가 아니거나 minimum 미만이면 default.
+    """
+    try:
+        value = int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def to_bool(value, default=False):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def iter_csv_rows(path, remove=False):
+    """
+    CSV 파일을 한 줄씩 읽는다. remove=True면 다 읽은 뒤 파일을 지운다.
+    """
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                yield row
+    finally:
+        if remove:
+            try:
+                os.remove(path)
+            except OSError:
+                pass